@@ -0,0 +1,44 @@
+import os
+import time
+import filecmp
+import argparse
+import tempfile
+import pandas as pd
+
+from preprocesamiento_csv import clean_text, clean_csv
+
+# Compara la limpieza original (todo el CSV en memoria y clean_text fila a fila) con
+# clean_csv (chunks, patrones fusionados y pool de procesos) sobre nz_earthquake.csv
+# replicado, y comprueba que ambos archivos de salida son idénticos byte a byte
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark de la limpieza de texto')
+    parser.add_argument('--escala', type=int, default=100, help='Veces que se replica el dataset')
+    parser.add_argument('--chunksize', type=int, default=50000)
+    parser.add_argument('--procesos', type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'nz_escalado.csv')
+        datos = pd.read_csv('../Dataset/nz_earthquake.csv', encoding="latin9")
+        pd.concat([datos] * args.escala, ignore_index=True).to_csv(filename, encoding="latin9", index=False)
+        print(f"Dataset escalado x{args.escala}: {len(datos) * args.escala} filas, {os.path.getsize(filename) / 1e6:.1f} MB")
+
+        # Versión original
+        start_time = time.time()
+        df_filtro_mx = pd.read_csv(filename, encoding="latin9")
+        df_filtro_mx['text'] = df_filtro_mx['text'].apply(str)
+        df_filtro_mx['text'] = df_filtro_mx['text'].apply(clean_text)
+        df_filtro_mx.to_csv(os.path.join(tmp, 'original.csv'), encoding="latin9", index=False)
+        tiempo_original = time.time() - start_time
+        del df_filtro_mx
+
+        # Versión por chunks y multiproceso
+        start_time = time.time()
+        total_rows = clean_csv(filename, os.path.join(tmp, 'rapido.csv'), chunksize=args.chunksize, processes=args.procesos)
+        tiempo_rapido = time.time() - start_time
+
+        identicos = filecmp.cmp(os.path.join(tmp, 'original.csv'), os.path.join(tmp, 'rapido.csv'), shallow=False)
+        print(f"Original: {tiempo_original:.2f} s ({total_rows / tiempo_original:.0f} filas/s)")
+        print(f"Chunks + procesos: {tiempo_rapido:.2f} s ({total_rows / tiempo_rapido:.0f} filas/s)")
+        print(f"Aceleración: {tiempo_original / tiempo_rapido:.2f}x")
+        print(f"Salidas idénticas byte a byte: {'sí' if identicos else 'NO'}")
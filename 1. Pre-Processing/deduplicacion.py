@@ -0,0 +1,130 @@
+import argparse
+import re
+import time
+import zlib
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Primo de Mersenne 2^61 - 1 para la familia de hashes (a * h + b) mod P
+PRIMO = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def shingles(texto, k=5):
+    """Hashes de los k-gramas de caracteres del texto en minúsculas y con los espacios colapsados"""
+    texto = re.sub(r'\s+', ' ', str(texto).lower()).strip()
+    if len(texto) <= k:
+        return np.array([zlib.crc32(texto.encode('utf-8'))], dtype=np.uint64)
+    return np.array(list({zlib.crc32(texto[i:i + k].encode('utf-8')) for i in range(len(texto) - k + 1)}), dtype=np.uint64)
+
+
+class MinHashLSH:
+    """
+    Firmas MinHash de los documentos y bandas LSH para encontrar pares candidatos
+    a casi duplicados sin comparar todos con todos. Dos documentos son candidatos
+    si coinciden en todas las filas de al menos una banda; después se confirma
+    que la similitud de Jaccard estimada por las firmas llega al umbral.
+    """
+
+    def __init__(self, num_perm=128, bandas=16, umbral=0.8, k=5, semilla=1):
+        if num_perm % bandas:
+            raise ValueError('num_perm debe ser múltiplo de bandas')
+        generador = np.random.RandomState(semilla)
+        self.a = generador.randint(1, PRIMO, size=num_perm, dtype=np.uint64)
+        self.b = generador.randint(0, PRIMO, size=num_perm, dtype=np.uint64)
+        self.filas_banda = num_perm // bandas
+        self.bandas = bandas
+        self.umbral = umbral
+        self.k = k
+        self.firmas = []
+        self.buckets = [defaultdict(list) for _ in range(bandas)]
+
+    def firma(self, texto):
+        hashes = shingles(texto, self.k)[:, np.newaxis]
+        # Los productos desbordan uint64 a propósito: siguen siendo una familia de hashes válida
+        return (((hashes * self.a + self.b) % PRIMO) & MAX_HASH).min(axis=0).astype(np.uint32)
+
+    def añadir(self, textos):
+        """Calcula las firmas de los textos y las reparte en los buckets de cada banda"""
+        for texto in textos:
+            posicion = len(self.firmas)
+            firma = self.firma(texto)
+            self.firmas.append(firma)
+            for banda in range(self.bandas):
+                inicio = banda * self.filas_banda
+                self.buckets[banda][firma[inicio:inicio + self.filas_banda].tobytes()].append(posicion)
+
+    def grupos(self):
+        """Devuelve, para cada documento, la posición del representante de su grupo (el primero que aparece)"""
+        padre = list(range(len(self.firmas)))
+
+        def raiz(x):
+            while padre[x] != x:
+                padre[x] = padre[padre[x]]
+                x = padre[x]
+            return x
+
+        for buckets in self.buckets:
+            for posiciones in buckets.values():
+                primero = posiciones[0]
+                for posicion in posiciones[1:]:
+                    r1, r2 = raiz(primero), raiz(posicion)
+                    if r1 == r2:
+                        continue
+                    if np.mean(self.firmas[primero] == self.firmas[posicion]) >= self.umbral:
+                        padre[max(r1, r2)] = min(r1, r2)
+        return [raiz(posicion) for posicion in range(len(padre))]
+
+
+def deduplicar_csv(filename, output_filename, text_column='text', id_column='id', chunksize=50000, encoding="latin9", **opciones):
+    """
+    Marca los casi duplicados de un CSV en dos pasadas por chunks: la primera
+    calcula las firmas y la segunda escribe cada fila con su representante_id,
+    el tamano_grupo y es_representante. Devuelve (documentos, grupos, duplicados).
+    """
+    lsh = MinHashLSH(**opciones)
+    ids = []
+    for chunk in pd.read_csv(filename, encoding=encoding, chunksize=chunksize, dtype=str):
+        lsh.añadir(chunk[text_column].fillna(''))
+        ids.extend(chunk[id_column] if id_column in chunk else chunk.index.astype(str))
+
+    representantes = lsh.grupos()
+    tamanos = defaultdict(int)
+    for representante in representantes:
+        tamanos[representante] += 1
+
+    inicio = 0
+    with open(output_filename, 'w', encoding=encoding, newline='') as f:
+        for numero, chunk in enumerate(pd.read_csv(filename, encoding=encoding, chunksize=chunksize, dtype=str)):
+            grupo = representantes[inicio:inicio + len(chunk)]
+            chunk['representante_id'] = [ids[r] for r in grupo]
+            chunk['tamano_grupo'] = [tamanos[r] for r in grupo]
+            chunk['es_representante'] = [r == inicio + i for i, r in enumerate(grupo)]
+            chunk.to_csv(f, index=False, header=numero == 0)
+            inicio += len(chunk)
+
+    return len(representantes), len(tamanos), len(representantes) - len(tamanos)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Eliminación de casi duplicados con MinHash y LSH')
+    parser.add_argument('--entrada', default='nz_corpus.csv', help='CSV ya limpiado con preprocesamiento_csv.py')
+    parser.add_argument('--salida', default='nz_corpus_dedup.csv')
+    parser.add_argument('--columna-texto', default='text')
+    parser.add_argument('--columna-id', default='id')
+    parser.add_argument('--umbral', type=float, default=0.8, help='Similitud de Jaccard mínima para considerar dos documentos duplicados')
+    parser.add_argument('--permutaciones', type=int, default=128, help='Tamaño de la firma MinHash')
+    parser.add_argument('--bandas', type=int, default=16, help='Bandas LSH (más bandas encuentran pares menos similares)')
+    parser.add_argument('--shingle', type=int, default=5, help='Caracteres por shingle')
+    parser.add_argument('--chunksize', type=int, default=50000, help='Filas por chunk')
+    args = parser.parse_args()
+
+    start_time = time.time()
+    documentos, grupos, duplicados = deduplicar_csv(args.entrada, args.salida, text_column=args.columna_texto, id_column=args.columna_id,
+                                                    chunksize=args.chunksize, num_perm=args.permutaciones, bandas=args.bandas,
+                                                    umbral=args.umbral, k=args.shingle)
+    print(f"{documentos} documentos, {grupos} grupos, {duplicados} casi duplicados ({time.time() - start_time:.2f} s)")
+    print(f"Llamadas al modelo ahorradas: {duplicados} en la extracción y las verificaciones de sus tripletas")
+    print(f"Resultado guardado en {args.salida}")
@@ -1,5 +1,9 @@
 
 from google.colab import files
+import os
+import shutil
+import itertools
+import numpy as np
 import pandas as pd
 import nltk
 from nltk.corpus import stopwords
@@ -17,9 +21,28 @@ datos = pd.read_csv(filename, encoding='UTF-8')
 # Mostrar el DataFrame
 datos.head(3)
 
+# Modo de ejecución:
+#  - 'entrenar': reentrena el modelo desde cero con todo el corpus (LdaMulticore) y lo guarda
+#  - 'actualizar': carga el diccionario y el modelo guardados, los actualiza solo con las filas
+#    nuevas (las que siguen a las ya procesadas en el CSV) y asigna tópicos solo a esas filas
+MODO = 'entrenar'
+RUTA_MODELO = 'modelo_lda'
+RUTA_DICCIONARIO = os.path.join(RUTA_MODELO, 'diccionario.dict')
+RUTA_LDA = os.path.join(RUTA_MODELO, 'lda.model')
+RUTA_MATRIZ_TOPICOS = os.path.join(RUTA_MODELO, 'documento_topico.npy')
+
+datos_completos = datos
+n_previos = 0
+if MODO == 'actualizar':
+    n_previos = np.load(RUTA_MATRIZ_TOPICOS, mmap_mode='r').shape[0]
+    datos = datos.iloc[n_previos:].copy()
+    print(f'Documentos ya procesados: {n_previos}, documentos nuevos: {len(datos)}')
+    if datos.empty:
+        raise SystemExit('No hay documentos nuevos: el modelo y la matriz guardados ya están al día')
+
 # Asegurarse de tener los stopwords de NLTK
 nltk.download('stopwords')
-stop_words = stopwords.words('spanish')
+stop_words = set(stopwords.words('spanish'))
 nltk.download('punkt')
 
 def preprocess(text):
@@ -32,46 +55,113 @@ def preprocess(text):
         return []
 
 # Preprocesar el texto, asegurándose de que 'texto_completo' sea de tipo texto
-datos['processed_text'] = datos['texto_completo'].astype(str).apply(preprocess)
+# (lista de tokens por documento; es la única estructura intermedia que se conserva)
+tokens_documentos = [preprocess(text) for text in datos['texto_completo'].astype(str)]
 
 !pip install spacy
 !python -m spacy download es_core_news_sm
 
 import spacy
 
-nlp = spacy.load("es_core_news_sm")
+# Para el lema bastan el tokenizador, el tagger/morphologizer y el lematizador
+nlp = spacy.load("es_core_news_sm", disable=["parser", "ner"])
+
+N_PROCESS = max(1, (os.cpu_count() or 1) - 1)  # Procesos de spaCy
+BATCH_SIZE = 1000
+
+# Lematiza cada token único una sola vez. Los documentos ya no son frases (se quitaron
+# las stopwords y la puntuación), así que el contexto apenas aporta al lema y basta con
+# lematizar el vocabulario y reutilizar el resultado en todos los documentos
+def lemmatize_vocabulary(vocabulary, batch_size=BATCH_SIZE, n_process=N_PROCESS):
+    vocabulary = list(vocabulary)
+    docs = nlp.pipe(vocabulary, batch_size=batch_size, n_process=n_process)
+    return {token: [t.lemma_ for t in doc] for token, doc in zip(vocabulary, docs)}
 
-# Función para lematizar una lista de tokens
-def lemmatize(tokens):
-    text = ' '.join(tokens)
-    doc = nlp(text)
-    lemmas = [token.lemma_ for token in doc]
-    return lemmas
+lemmas = lemmatize_vocabulary(set(itertools.chain.from_iterable(tokens_documentos)))
+print(f'Tokens únicos lematizados: {len(lemmas)}')
 
-datos['processed_text'] = datos['processed_text'].apply(lemmatize)
+datos['processed_text'] = [[lemma for token in tokens for lemma in lemmas[token]] for tokens in tokens_documentos]
+del tokens_documentos
 
 datos.head(3)
 
-from gensim.models import LdaModel
+from gensim.models import LdaModel, LdaMulticore
 import random
-import numpy as np
 import matplotlib.pyplot as plt
 from wordcloud import WordCloud
 
 from gensim.corpora import Dictionary
 
-diccionario = Dictionary(datos.processed_text)
-print(f'Número de tokens: {len(diccionario)}')
+if MODO == 'actualizar':
+    # El vocabulario del modelo es fijo: las palabras que no estén en el diccionario se ignoran
+    diccionario = Dictionary.load(RUTA_DICCIONARIO)
+else:
+    diccionario = Dictionary(datos.processed_text)
+    print(f'Número de tokens: {len(diccionario)}')
 
-diccionario.filter_extremes(no_below=2, no_above = 0.8)
-print(f'Número de tokens: {len(diccionario)}')
+    diccionario.filter_extremes(no_below=2, no_above = 0.8)
+    print(f'Número de tokens: {len(diccionario)}')
 
 corpus = [diccionario.doc2bow(tweet) for tweet in datos.processed_text]
 
-print(corpus[6])
-
-lda = LdaModel(corpus=corpus, id2word=diccionario, num_topics=20, random_state=42,
-               chunksize=1000, passes=100, alpha='auto')
+if corpus:
+    print(corpus[0])
+
+if MODO == 'actualizar':
+    # Actualización online con las filas nuevas, sin repetir las 100 pasadas sobre todo el corpus
+    lda = LdaModel.load(RUTA_LDA)
+    if corpus:
+        lda.update(corpus)
+else:
+    # LdaMulticore reparte el entrenamiento entre procesos; no admite alpha='auto',
+    # así que usa el alpha simétrico por defecto
+    lda = LdaMulticore(corpus=corpus, id2word=diccionario, num_topics=20, random_state=42,
+                       chunksize=1000, passes=100, workers=max(1, (os.cpu_count() or 1) - 1))
+
+# Distribución de tópicos de todo el corpus en una sola pasada por bloques: lda.inference
+# devuelve los parámetros variacionales (gamma) de todo un bloque y, normalizados por
+# fila, son la misma distribución que lda[bow] calcula documento a documento
+def matriz_documento_topico(lda, corpus, chunksize=10000, ruta_memmap=None):
+    n_docs, n_topicos = len(corpus), lda.num_topics
+    if ruta_memmap:
+        # Matriz en disco (.npy) para corpus que no caben en memoria
+        theta = np.lib.format.open_memmap(ruta_memmap, mode='w+', dtype=np.float32, shape=(n_docs, n_topicos))
+    else:
+        theta = np.empty((n_docs, n_topicos), dtype=np.float32)
+
+    for inicio in range(0, n_docs, chunksize):
+        gamma, _ = lda.inference(corpus[inicio:inicio + chunksize])
+        theta[inicio:inicio + len(gamma)] = gamma / gamma.sum(axis=1, keepdims=True)
+    return theta
+
+# Guarda juntos el diccionario, el modelo y la matriz documento-tópico (las filas anteriores
+# más las nuevas). Se escriben en una carpeta temporal que después sustituye a la guardada,
+# así que un fallo a medias no deja un modelo actualizado con la matriz antigua (el número
+# de filas de la matriz es lo que indica qué filas del CSV ya están incorporadas al modelo)
+def guardar_modelo(diccionario, lda, theta_nuevos, n_previos):
+    temporal, anterior = RUTA_MODELO + '_tmp', RUTA_MODELO + '_anterior'
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    diccionario.save(os.path.join(temporal, os.path.basename(RUTA_DICCIONARIO)))
+    lda.save(os.path.join(temporal, os.path.basename(RUTA_LDA)))
+
+    theta = np.lib.format.open_memmap(os.path.join(temporal, os.path.basename(RUTA_MATRIZ_TOPICOS)), mode='w+',
+                                      dtype=np.float32, shape=(n_previos + len(theta_nuevos), theta_nuevos.shape[1]))
+    if n_previos:
+        theta[:n_previos] = np.load(RUTA_MATRIZ_TOPICOS, mmap_mode='r')[:n_previos]
+    theta[n_previos:] = theta_nuevos
+    theta.flush()
+    del theta
+
+    if os.path.exists(RUTA_MODELO):
+        shutil.rmtree(anterior, ignore_errors=True)
+        os.replace(RUTA_MODELO, anterior)
+    os.replace(temporal, RUTA_MODELO)
+    shutil.rmtree(anterior, ignore_errors=True)
+    return np.load(RUTA_MATRIZ_TOPICOS, mmap_mode='r')
+
+# Solo se infieren los tópicos de las filas nuevas; las anteriores se leen de la matriz guardada
+theta = guardar_modelo(diccionario, lda, matriz_documento_topico(lda, corpus), n_previos)
 
 topicos = lda.print_topics(num_words=5, num_topics=20)
 for topico in topicos:
@@ -99,7 +189,7 @@ for i in range(0, 10):
     plt.title("Tópico " + str(i))
     plt.show()
 
-indice_noticia = random.randint(0,len(datos))
+indice_noticia = random.randint(0,len(datos) - 1)
 noticia = datos.iloc[indice_noticia]
 print(noticia.processed_text)
 
@@ -126,30 +216,34 @@ for ind, topico in distribucion_topicos.iterrows():
     palabras = ', '.join(palabras)
     print(palabras, "\n")
 
-datos['topico']=''
-
-for i in range(0,len(datos)):
-    print(i)
-    indice_noticia = i
-    noticia = datos.iloc[indice_noticia]
-    bow_noticia = corpus[indice_noticia]
-    distribucion_noticia = lda[bow_noticia]
-    dist_indices = [topico[0] for topico in lda[bow_noticia]]
-    # Contribución de los topicos mas significativos
-    dist_contrib = [topico[1] for topico in lda[bow_noticia]]
-
-    max_length = max(len(dist_indices), len(dist_contrib))
-    dist_indices += [None] * (max_length - len(dist_indices))
-    dist_contrib += [None] * (max_length - len(dist_contrib))
-    distribucion_topicos = pd.DataFrame({'Topico':dist_indices,
-                                     'Contribucion':dist_contrib })
-    distribucion_topicos.sort_values('Contribucion',
-                                 ascending=False, inplace=True)
-    datos['topico'].iloc[i]=distribucion_topicos.Topico.iloc[0]
+TOP_K = 3  # Tópicos más probables a guardar por documento (0 para no guardarlos)
+
+output_filename = '....csv'
+
+if MODO == 'actualizar':
+    # processed_text solo se calcula para las filas nuevas: el de las anteriores se lee de la salida
+    # previa, que este script reescribe en el mismo archivo (con el índice en la primera columna)
+    if os.path.exists(output_filename):
+        previos = pd.read_csv(output_filename, index_col=0, nrows=n_previos,
+                              usecols=lambda columna: columna in ('Unnamed: 0', 'processed_text'))['processed_text']
+        datos_completos['processed_text'] = pd.concat([previos, datos['processed_text']])
+    else:
+        # Sin salida previa, las filas anteriores se quedan sin processed_text en lugar de relematizarlas
+        print(f'No se encontró {output_filename}: las filas ya procesadas se guardan sin processed_text')
+        datos_completos['processed_text'] = datos['processed_text']
+    datos = datos_completos
+
+datos['topico'] = theta.argmax(axis=1)
+datos['probabilidad_topico'] = theta.max(axis=1)
+
+if TOP_K:
+    # argpartition elige los k mayores sin ordenar toda la fila; luego se ordenan solo esos k
+    top_k = np.argpartition(-theta, min(TOP_K, lda.num_topics) - 1, axis=1)[:, :TOP_K]
+    orden = np.argsort(-np.take_along_axis(theta, top_k, axis=1), axis=1)
+    datos['topicos_top_k'] = np.take_along_axis(top_k, orden, axis=1).tolist()
 
 datos.head()
 
-output_filename = '....csv'
 datos.to_csv(output_filename)
 print(f"Archivo procesado y guardado en {output_filename}")
 
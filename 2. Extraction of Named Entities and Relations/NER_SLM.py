@@ -1,7 +1,31 @@
 import pandas as pd
 import gc
-import ollama
 import json
+import argparse
+import time
+import os
+import functools
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from backends_slm import BACKENDS, crear_backend
+from cache_respuestas import CacheRespuestas
+from escritura_incremental import EscritorIncremental
+from compilador_prompt import PromptCompiler, format_example
+from empaquetado import empaquetar, separar_respuesta
+from salida_estructurada import stream_tripletas
+from cubetas_longitud import LIMITES_POR_DEFECTO, ReporteCubetas, agrupar_por_longitud, concurrencia_de
+from cascada import ReporteCascada, evaluar_salida
+from filtro_topicos import FiltroTopicos
+from reparto_duplicados import RepartoDuplicados
+from gazetteer_lugares import Gazetteer
+
+MODEL = 'smollm2' #llama2model olmo2model gemma3model deepmodel llama4model phi3 smollm2 qwen3:4b orca-mini
+
+@functools.lru_cache(maxsize=None)
+def cliente_por_defecto():
+    """Backend de Ollama usado cuando no se pasa client; se crea la primera vez, así ollama solo hace falta si se usa"""
+    return crear_backend('ollama')
 
 def load_examples(filename):
     """Carga los ejemplos desde un archivo JSON"""
@@ -13,35 +37,58 @@ def load_examples(filename):
 
 def format_examples(examples):
     """Formatea los ejemplos para el prompt"""
-    formatted_examples = ""
-    for example in examples:
-        formatted_examples += f"\nTexto de entrada: {example['input']}\nSalida JSON:\n{json.dumps(example['output'], indent=2, ensure_ascii=False)}\n"
-    return formatted_examples
+    return ''.join(format_example(example) for example in examples)
 
-def process_text(text, examples):
-    formatted_examples = format_examples(examples)
-    
-    prompt = f"""Eres un experto en extracción de relaciones semánticas con formato estructurado JSON.
-    Aquí tienes algunos ejemplos de cómo extraer entidades y relaciones en formato JSON: {formatted_examples}
-    Siguiendo EXACTAMENTE el mismo formato de {formatted_examples}, analiza el siguiente texto y genera ÚNICAMENTE un array JSON. NO incluyas explicaciones ni texto adicional:{text}
-    
-    IMPORTANTE:
-    - La salida debe ser únicamente un array JSON parseable
-    - Cada objeto del array debe tener exactamente estas claves: "head", "head_type", "relation", "tail", "tail_type"
-    - No incluyas comentarios ni texto adicional
+def process_text(text, compiler, model=MODEL, client=None, cache=None, usage=None, structured=False):
     """
+    Extrae las tripletas de un texto; si se pasa usage, se rellena con los tokens de prompt y de respuesta.
+    Con structured=True la salida se restringe al esquema JSON, se lee como stream y se devuelve
+    directamente el array JSON de tripletas válidas.
+    """
+    if client is None:
+        client = cliente_por_defecto()
+    messages = compiler.compile(text)
+    cache_model = f"{model}#esquema" if structured else model
+
+    # Consultar primero la caché: el mismo modelo, prompt y texto dan la misma respuesta
+    if cache is not None:
+        key = cache.clave(cache_model, compiler.render(messages), text)
+        cached = cache.obtener(key)
+        if cached is not None:
+            return cached
+
+    if structured:
+        parser = stream_tripletas(client, model, messages, usage=usage)
+        if parser.invalidas:
+            print(f"{parser.invalidas} tripletas descartadas por no cumplir el esquema")
+        content = parser.to_json()
+    else:
+        response = client.chat(model=model, messages=messages)
+        content = response['message']['content']
+        if usage is not None:
+            usage['prompt_tokens'] = response.get('prompt_eval_count')
+            usage['completion_tokens'] = response.get('eval_count')
 
-    response = ollama.chat(model='smollm2', messages=[{'role': 'user', 'content': prompt}]) #llama2model olmo2model gemma3model deepmodel llama4model phi3 smollm2 qwen3:4b orca-mini
-    return response['message']['content']
+    if cache is not None:
+        cache.guardar(key, cache_model, content)
+    return content
 
-def process_df_chunk(chunk, text_column, output_column, examples):
+def add_usage_columns(chunk, usages):
+    """Añade al chunk los tokens de prompt y de respuesta de cada fila"""
+    chunk['tokens_prompt'] = [usage.get('prompt_tokens') for usage in usages]
+    chunk['tokens_completion'] = [usage.get('completion_tokens') for usage in usages]
+
+def process_df_chunk(chunk, text_column, output_column, compiler, client=None, cache=None, structured=False, model=MODEL):
     results = []
+    usages = []
     total_rows = len(chunk)
     
     for index, row in chunk.iterrows():
         try:
             text = row[text_column]
-            result = process_text(text, examples)
+            usage = {}
+            usages.append(usage)
+            result = process_text(text, compiler, model=model, client=client, cache=cache, usage=usage, structured=structured)
             results.append(result)
             
             # Liberar memoria
@@ -56,27 +103,338 @@ def process_df_chunk(chunk, text_column, output_column, examples):
             results.append(None)
     
     chunk[output_column] = results
+    add_usage_columns(chunk, usages)
     return chunk
 
-# Cargar ejemplos desde archivo JSON
-examples = load_examples('ejemplos_desastres.json')
+def process_df_chunk_concurrent(chunk, text_column, output_column, compiler, client, max_in_flight=4, cache=None, structured=False, model=MODEL):
+    """Procesa un chunk con varias peticiones simultáneas y reensambla los resultados en el orden original"""
+    texts = chunk[text_column].tolist()
+    results = [None] * len(texts)
+    usages = [{} for _ in texts]
+    total_rows = len(texts)
+
+    # max_in_flight limita las peticiones que Ollama atiende a la vez
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = {executor.submit(process_text, text, compiler, model=model, client=client, cache=cache, usage=usages[i], structured=structured): i for i, text in enumerate(texts)}
+        for completed, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                print(f"Error en fila {chunk.index[i]}: {str(e)}")
+
+            print(f"Procesado {completed}/{total_rows} ({(completed/total_rows)*100:.2f}%)")
+
+    chunk[output_column] = results
+    add_usage_columns(chunk, usages)
+    return chunk
+
+def process_pack(docs, compiler, model=MODEL, client=None, cache=None, fallbacks=None):
+    """
+    Extrae las tripletas de varios documentos (id, texto) en una sola llamada.
+    Los documentos que faltan en la respuesta, o todos si la llamada del
+    paquete falla, se procesan de forma individual y se añaden a fallbacks.
+    Devuelve un diccionario id -> (resultado, usage).
+    """
+    if client is None:
+        client = cliente_por_defecto()
+    results = {}
+    pending = []
+
+    # Los resultados obtenidos en paquete se guardan en la caché con una clave propia
+    keys = {}
+    for doc_id, text in docs:
+        if cache is not None:
+            keys[doc_id] = cache.clave(f"{model}#paquete", compiler.render(compiler.compile(text)), text)
+            cached = cache.obtener(keys[doc_id])
+            if cached is not None:
+                results[doc_id] = (cached, {})
+                continue
+        pending.append((doc_id, text))
+
+    if len(pending) > 1:
+        try:
+            response = client.chat(model=model, messages=compiler.compile_pack(pending))
+            separated = separar_respuesta(response['message']['content'], [doc_id for doc_id, _ in pending])
+        except Exception as e:
+            # Un paquete es más largo que un documento suelto y es más fácil que agote el tiempo de espera
+            print(f"Error en el paquete de filas {pending[0][0]}-{pending[-1][0]}, se procesan de una en una: {str(e)}")
+            response = {}
+            separated = {}
+
+        # Los tokens del paquete se reparten a partes iguales entre sus documentos
+        prompt_tokens = response.get('prompt_eval_count')
+        completion_tokens = response.get('eval_count')
+        for doc_id, content in separated.items():
+            results[doc_id] = (content, {
+                'prompt_tokens': prompt_tokens / len(pending) if prompt_tokens is not None else None,
+                'completion_tokens': completion_tokens / len(pending) if completion_tokens is not None else None
+            })
+            if cache is not None:
+                cache.guardar(keys[doc_id], f"{model}#paquete", content)
+
+    for doc_id, text in pending:
+        if doc_id not in results:
+            if fallbacks is not None and len(pending) > 1:
+                fallbacks.append(doc_id)
+            usage = {}
+            try:
+                results[doc_id] = (process_text(text, compiler, model=model, client=client, cache=cache, usage=usage), usage)
+            except Exception as e:
+                print(f"Error en fila {doc_id}: {str(e)}")
+
+    return results
+
+def process_df_chunk_packed(chunk, text_column, output_column, compiler, client=None, cache=None, max_docs=8, max_tokens=None, max_in_flight=1, model=MODEL):
+    """Procesa un chunk empaquetando varios documentos por llamada al modelo"""
+    docs = list(zip(chunk.index, chunk[text_column].tolist()))
+    packs = list(empaquetar(docs, max_docs=max_docs, max_tokens=max_tokens))
+    results = {}
+    fallbacks = []
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = {executor.submit(process_pack, pack, compiler, model=model, client=client, cache=cache, fallbacks=fallbacks): pack for pack in packs}
+        for completed, future in enumerate(as_completed(futures), start=1):
+            pack = futures[future]
+            try:
+                results.update(future.result())
+            except Exception as e:
+                print(f"Error en el paquete de filas {pack[0][0]}-{pack[-1][0]}: {str(e)}")
+
+            print(f"Paquete {completed}/{len(packs)} ({(completed/len(packs))*100:.2f}%)")
+
+    if fallbacks:
+        print(f"{len(fallbacks)} de {len(docs)} filas procesadas de una en una por faltar en la respuesta de su paquete")
+
+    chunk[output_column] = [results.get(doc_id, (None, {}))[0] for doc_id, _ in docs]
+    add_usage_columns(chunk, [results.get(doc_id, (None, {}))[1] for doc_id, _ in docs])
+    return chunk
+
+def process_df_chunk_bucketed(chunk, text_column, output_column, compiler, client, reporte, limites=LIMITES_POR_DEFECTO, concurrencias=(4,), parallel=False, cache=None, structured=False, model=MODEL):
+    """
+    Procesa un chunk agrupando las filas en cubetas por longitud en tokens.
+    Por defecto las cubetas se envían de la más corta a la más larga; con
+    parallel=True todas las cubetas se procesan a la vez, cada una con su
+    propia concurrencia. Los resultados conservan el orden original.
+    """
+    texts = chunk[text_column].tolist()
+    results = [None] * len(texts)
+    usages = [{} for _ in texts]
+    cubetas, tokens = agrupar_por_longitud(texts, limites)
+
+    def process_bucket(cubeta, positions):
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=concurrencia_de(cubeta, concurrencias)) as executor:
+            futures = {executor.submit(process_text, texts[i], compiler, model=model, client=client, cache=cache, usage=usages[i], structured=structured): i for i in positions}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    print(f"Error en fila {chunk.index[i]}: {str(e)}")
+        reporte.registrar(cubeta, len(positions), sum(tokens[i] for i in positions), time.time() - start_time)
+
+    non_empty = [(cubeta, positions) for cubeta, positions in enumerate(cubetas) if positions]
+    if parallel:
+        with ThreadPoolExecutor(max_workers=max(1, len(non_empty))) as executor:
+            for future in [executor.submit(process_bucket, cubeta, positions) for cubeta, positions in non_empty]:
+                future.result()
+    else:
+        for cubeta, positions in non_empty:
+            process_bucket(cubeta, positions)
+
+    chunk[output_column] = results
+    add_usage_columns(chunk, usages)
+    return chunk
+
+def process_text_cascade(text, compiler, models, reporte, client=None, cache=None, structured=False, min_soporte=0.5, usage=None):
+    """
+    Extrae las tripletas probando los modelos en orden (del más barato al más caro).
+    Una fila pasa al siguiente modelo solo si la salida no cumple el esquema, no tiene
+    tripletas o no se apoya en el texto fuente. Devuelve (resultado, modelo que lo produjo).
+    """
+    content = None
+    for model in models:
+        model_usage = {}
+        start_time = time.time()
+        content = process_text(text, compiler, model=model, client=client, cache=cache, usage=model_usage, structured=structured)
+        motivo = evaluar_salida(content, text, min_soporte=min_soporte)
+        reporte.registrar(model, time.time() - start_time, model_usage, motivo)
+
+        # El coste de la fila es la suma de todos los niveles por los que pasó
+        if usage is not None:
+            for key, value in model_usage.items():
+                usage[key] = (usage.get(key) or 0) + (value or 0)
+        if motivo is None:
+            return content, model
+
+    # Ningún modelo dio una salida aceptable: se conserva la del último nivel
+    reporte.registrar_sin_aceptar()
+    return content, models[-1]
+
+def process_df_chunk_cascade(chunk, text_column, output_column, compiler, client, models, reporte, max_in_flight=1, cache=None, structured=False, min_soporte=0.5):
+    """Procesa un chunk con la cascada de modelos; la columna modelo_cascada indica el modelo aceptado"""
+    texts = chunk[text_column].tolist()
+    results = [(None, None)] * len(texts)
+    usages = [{} for _ in texts]
+    total_rows = len(texts)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = {executor.submit(process_text_cascade, text, compiler, models, reporte, client=client, cache=cache,
+                                   structured=structured, min_soporte=min_soporte, usage=usages[i]): i for i, text in enumerate(texts)}
+        for completed, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                print(f"Error en fila {chunk.index[i]}: {str(e)}")
+
+            print(f"Procesado {completed}/{total_rows} ({(completed/total_rows)*100:.2f}%)")
+
+    chunk[output_column] = [content for content, _ in results]
+    chunk['modelo_cascada'] = [model for _, model in results]
+    add_usage_columns(chunk, usages)
+    return chunk
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extracción de entidades y relaciones con SLMs')
+    parser.add_argument('--concurrencia', type=int, default=1, help='Peticiones simultáneas a Ollama (1 = secuencial)')
+    parser.add_argument('--timeout', type=float, default=None, help='Tiempo máximo por petición en segundos')
+    parser.add_argument('--backend', choices=list(BACKENDS), default='ollama', help='Servidor del modelo: ollama, openai (API compatible local) o fake (respuestas fijas, sin modelo)')
+    parser.add_argument('--host', default=None, help='URL del servidor (por defecto OLLAMA_HOST o localhost)')
+    parser.add_argument('--latencia-fake', type=float, default=None, help='Latencia en segundos por petición del backend fake')
+    parser.add_argument('--cache', default='cache_respuestas.sqlite', help='Archivo SQLite con las respuestas ya calculadas')
+    parser.add_argument('--sin-cache', action='store_true', help='Desactivar la caché de respuestas')
+    parser.add_argument('--entrada', default='C:/Users/LUIS VILCHES/Desktop/KG LLM/a_Datasets/GDELT_LDA_FILTRADO.csv', help='CSV con la columna texto_completo')
+    parser.add_argument('--salida', default='C:/Users/LUIS VILCHES/Desktop/gdelt_fewshot_smollm2.csv', help='Archivo de salida (.csv, .jsonl o .parquet)')
+    parser.add_argument('--resume', action='store_true', help='Continuar desde el último checkpoint, omitiendo las filas ya escritas')
+    parser.add_argument('--k-ejemplos', type=int, default=None, help='Usar solo los k ejemplos más similares a cada texto')
+    parser.add_argument('--max-tokens-prompt', type=int, default=None, help='Presupuesto máximo de tokens del prompt')
+    parser.add_argument('--paquete', type=int, default=1, help='Documentos por llamada al modelo (1 = sin empaquetar)')
+    parser.add_argument('--paquete-tokens', type=int, default=None, help='Tokens estimados máximos de los textos de un paquete')
+    parser.add_argument('--estructurado', action='store_true', help='Restringir la salida al esquema JSON de tripletas y cortar la generación al cerrar el array')
+    parser.add_argument('--cubetas', type=int, nargs='*', default=None, help=f'Agrupar las filas por longitud con estos límites de tokens (sin valores: {LIMITES_POR_DEFECTO})')
+    parser.add_argument('--concurrencia-cubetas', type=int, nargs='+', default=None, help='Concurrencia de cada cubeta, de la más corta a la más larga')
+    parser.add_argument('--cubetas-paralelas', action='store_true', help='Procesar todas las cubetas a la vez en lugar de la más corta primero')
+    parser.add_argument('--cascada', nargs='+', default=None, help='Modelos en orden de coste; una fila pasa al siguiente solo si la salida falla')
+    parser.add_argument('--min-soporte', type=float, default=0.5, help='Fracción mínima de tripletas respaldadas por el texto para aceptar una salida de la cascada')
+    parser.add_argument('--topicos-relevantes', type=int, nargs='+', default=None, help='Tópicos LDA de desastres; las filas con poca masa en ellos no se envían al modelo')
+    parser.add_argument('--umbral-topicos', type=float, default=0.3, help='Masa mínima de los tópicos relevantes para enviar una fila al modelo')
+    parser.add_argument('--matriz-topicos', default=None, help='documento_topico.npy de lda_topic_llm.py (sin él se usan las columnas topico y probabilidad_topico)')
+    parser.add_argument('--columna-fila', default=None, help='Columna con la fila de la matriz de tópicos (por defecto, el índice)')
+    parser.add_argument('--pospuestas', default=None, help='Guardar aquí las filas filtradas para extraerlas más tarde, en lugar de descartarlas')
+    parser.add_argument('--duplicados', action='store_true', help='Extraer solo un representante por grupo de casi duplicados (columnas de deduplicacion.py) y copiar sus tripletas')
+    parser.add_argument('--columna-id', default='id', help='Columna con el id del documento usada por deduplicacion.py (si no existe, el índice)')
+    parser.add_argument('--gazetteer', default=None, help='CSV con las columnas location_type y location_text para construir la lista de lugares')
+    parser.add_argument('--lugares-extra', default=None, help='Archivo con más lugares para el gazetteer, uno por línea')
+    parser.add_argument('--omitir-solo-lugares', action='store_true', help='No enviar al modelo las filas que solo mencionan lugares')
+    parser.add_argument('--chunksize', type=int, default=100, help='Filas leídas por chunk (con cubetas conviene un valor mayor)')
+    args = parser.parse_args()
+    if args.estructurado and args.paquete > 1:
+        parser.error('--estructurado no se puede combinar con --paquete')
+
+    # Cargar ejemplos desde archivo JSON
+    examples_filename = 'ejemplos_desastres.json'
+    examples = load_examples(examples_filename)
+    gazetteer = None
+    if args.gazetteer:
+        gazetteer = Gazetteer.desde_csv(args.gazetteer, lugares_extra=args.lugares_extra)
+        print(f"Gazetteer con {gazetteer.total} lugares")
+    compiler = PromptCompiler(examples, k_ejemplos=args.k_ejemplos, max_prompt_tokens=args.max_tokens_prompt, examples_filename=examples_filename, gazetteer=gazetteer)
 
-# Procesar el DataFrame en chunks
-text_column = 'texto_completo'
-output_column = 'TripletasLlama'
-chunksize = 100  # Tamaño del chunk
+    # Procesar el DataFrame en chunks
+    text_column = 'texto_completo'
+    output_column = 'TripletasLlama'
+    chunksize = args.chunksize  # Tamaño del chunk
 
-filename = 'C:/Users/LUIS VILCHES/Desktop/KG LLM/a_Datasets/GDELT_LDA_FILTRADO.csv'
-output_filename = 'C:/Users/LUIS VILCHES/Desktop/gdelt_fewshot_smollm2.csv'
+    filename = args.entrada
+    output_filename = args.salida
 
-chunk_list = []
+    client = crear_backend(args.backend, host=args.host, timeout=args.timeout, latencia=args.latencia_fake)
+    cache = None if args.sin_cache else CacheRespuestas(args.cache)
+    limites = None
+    if args.cubetas is not None:
+        limites = sorted(args.cubetas) or LIMITES_POR_DEFECTO
+        reporte_cubetas = ReporteCubetas(limites)
+    if args.cascada:
+        reporte_cascada = ReporteCascada(args.cascada)
+    filtro = None
+    if args.topicos_relevantes:
+        filtro = FiltroTopicos(args.topicos_relevantes, umbral=args.umbral_topicos, matriz_topicos=args.matriz_topicos, columna_fila=args.columna_fila)
+        writer_pospuestas = EscritorIncremental(args.pospuestas, resume=args.resume) if args.pospuestas else None
+    reparto = RepartoDuplicados(id_column=args.columna_id) if args.duplicados else None
+    # Columnas que añade la extracción a cada fila
+    columnas_modelo = [output_column] + (['modelo_cascada'] if args.cascada else []) + ['tokens_prompt', 'tokens_completion']
+    writer = EscritorIncremental(output_filename, resume=args.resume)
+    if writer.ultimo_id is not None:
+        print(f"Reanudando después de la fila {writer.ultimo_id} ({writer.filas_escritas} filas ya escritas)")
 
-for chunk in pd.read_csv(filename, encoding="latin8", chunksize=chunksize):
-    processed_chunk = process_df_chunk(chunk, text_column, output_column, examples)
-    chunk_list.append(processed_chunk)
+    filas_procesadas = 0
+    tokens_prompt = 0
+    tokens_completion = 0
+    filas_solo_lugares = 0
+    start_time = time.time()
 
-df_tripletas = pd.concat(chunk_list)
+    # Cada chunk se escribe en cuanto termina, así la memoria no crece con el corpus
+    for chunk in pd.read_csv(filename, encoding="latin8", chunksize=chunksize):
+        chunk = writer.pendientes(chunk)
+        if filtro is not None and not chunk.empty:
+            chunk, apartadas = filtro.separar(chunk, text_column)
+            if writer_pospuestas is not None:
+                apartadas = writer_pospuestas.pendientes(apartadas)
+                if not apartadas.empty:
+                    writer_pospuestas.escribir(apartadas)
+        resueltas = chunk.iloc[:0]
+        if gazetteer is not None and not chunk.empty:
+            chunk, resueltas = gazetteer.anotar(chunk, text_column, output_column, omitir_solo_lugares=args.omitir_solo_lugares)
+            filas_solo_lugares += len(resueltas)
+        # Vacío también cuando el gazetteer resuelve todo el chunk, para que repartir reciba siempre un DataFrame
+        duplicados = chunk.iloc[:0]
+        if reparto is not None and not chunk.empty:
+            chunk, duplicados = reparto.separar(chunk)
+        if chunk.empty and resueltas.empty and duplicados.empty:
+            continue
+        if chunk.empty:
+            # Solo hay filas que no necesitan el modelo: se añaden vacías las columnas que escribe el modelo,
+            # para que el chunk tenga las mismas columnas y en el mismo orden que los demás
+            processed_chunk = chunk.reindex(columns=list(chunk.columns) + columnas_modelo)
+        elif args.cascada:
+            processed_chunk = process_df_chunk_cascade(chunk, text_column, output_column, compiler, client, args.cascada, reporte_cascada,
+                                                       max_in_flight=args.concurrencia, cache=cache, structured=args.estructurado, min_soporte=args.min_soporte)
+        elif limites is not None:
+            processed_chunk = process_df_chunk_bucketed(chunk, text_column, output_column, compiler, client, reporte_cubetas, limites=limites,
+                                                        concurrencias=args.concurrencia_cubetas or [args.concurrencia], parallel=args.cubetas_paralelas,
+                                                        cache=cache, structured=args.estructurado)
+        elif args.paquete > 1:
+            processed_chunk = process_df_chunk_packed(chunk, text_column, output_column, compiler, client=client, cache=cache, max_docs=args.paquete, max_tokens=args.paquete_tokens, max_in_flight=args.concurrencia)
+        elif args.concurrencia > 1:
+            processed_chunk = process_df_chunk_concurrent(chunk, text_column, output_column, compiler, client, max_in_flight=args.concurrencia, cache=cache, structured=args.estructurado)
+        else:
+            processed_chunk = process_df_chunk(chunk, text_column, output_column, compiler, client=client, cache=cache, structured=args.estructurado)
+        if not resueltas.empty:
+            processed_chunk = pd.concat([processed_chunk, resueltas]).sort_index()
+        # Después de unir las filas resueltas, para que tripletas_de quede siempre al final aunque el chunk sea solo de lugares
+        if reparto is not None:
+            processed_chunk = reparto.repartir(processed_chunk, duplicados, output_column)
+        writer.escribir(processed_chunk)
+        filas_procesadas += len(processed_chunk)
+        tokens_prompt += processed_chunk['tokens_prompt'].sum()
+        tokens_completion += processed_chunk['tokens_completion'].sum()
 
-# Guardar resultados
-df_tripletas.to_csv(output_filename, index=False)
-print(f"Archivo procesado y guardado en {output_filename}")
+    elapsed_time = time.time() - start_time
+    print(f"Archivo procesado y guardado en {output_filename}")
+    print(f"Filas por segundo: {filas_procesadas/elapsed_time:.2f}")
+    print(f"Tokens de prompt: {tokens_prompt:.0f}, tokens de respuesta: {tokens_completion:.0f}")
+    if limites is not None:
+        print(reporte_cubetas.resumen())
+    if args.cascada:
+        print(reporte_cascada.resumen())
+    if filtro is not None:
+        print(filtro.resumen())
+    if reparto is not None:
+        print(reparto.resumen())
+    if args.omitir_solo_lugares:
+        print(f"Filas que solo mencionan lugares (sin llamar al modelo): {filas_solo_lugares}")
+    if cache is not None:
+        print(cache.resumen())
+        cache.cerrar()
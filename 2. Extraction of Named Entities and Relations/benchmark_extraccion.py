@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from NER_SLM import load_examples, process_df_chunk, process_df_chunk_concurrent
+from backends_slm import crear_backend
+from fake_ollama_server import iniciar_servidor
+from compilador_prompt import PromptCompiler
+
+# Mide filas por segundo sin necesidad de un modelo real: contra el servidor Ollama falso (HTTP)
+# o contra el backend fake en proceso, que no abre ninguna conexión
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark de extracción con un servidor Ollama falso')
+    parser.add_argument('--filas', type=int, default=40, help='Número de filas del dataset a procesar')
+    parser.add_argument('--latencia', type=float, default=0.2, help='Latencia simulada por petición en segundos')
+    parser.add_argument('--estructurado', action='store_true', help='Usar la salida restringida al esquema y leída como stream')
+    parser.add_argument('--backend', choices=['ollama', 'fake'], default='ollama', help='ollama: servidor HTTP falso; fake: backend en proceso')
+    parser.add_argument('--concurrencias', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    servidor = None
+    if args.backend == 'fake':
+        url = 'en proceso'
+        client = crear_backend('fake', latencia=args.latencia)
+    else:
+        servidor, url = iniciar_servidor(latencia=args.latencia)
+        client = crear_backend('ollama', host=url, timeout=30)
+
+    compiler = PromptCompiler(load_examples('ejemplos_desastres.json'))
+    datos = pd.read_csv('../Dataset/nz_earthquake.csv', encoding="latin9").head(args.filas)
+    datos['text'] = datos['text'].astype(str)
+
+    print(f"Backend {args.backend} ({url}), {len(datos)} filas, latencia {args.latencia}s")
+    for concurrencia in args.concurrencias:
+        chunk = datos.copy()
+        start_time = time.time()
+        if concurrencia > 1:
+            process_df_chunk_concurrent(chunk, 'text', 'TripletasLlama', compiler, client, max_in_flight=concurrencia, structured=args.estructurado)
+        else:
+            process_df_chunk(chunk, 'text', 'TripletasLlama', compiler, client=client, structured=args.estructurado)
+        elapsed_time = time.time() - start_time
+        print(f"Concurrencia {concurrencia}: {len(chunk)/elapsed_time:.2f} filas/s ({elapsed_time:.2f} s)")
+
+    if servidor is not None:
+        servidor.shutdown()
@@ -0,0 +1,53 @@
+import sqlite3
+import hashlib
+import threading
+
+class CacheRespuestas:
+    """Caché persistente en SQLite de las respuestas del modelo, direccionada por contenido"""
+
+    def __init__(self, ruta='cache_respuestas.sqlite'):
+        self.ruta = ruta
+        self.aciertos = 0
+        self.fallos = 0
+        # Una sola conexión compartida entre hilos, protegida por un lock
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute('PRAGMA journal_mode=WAL')
+        self._conexion.execute(
+            'CREATE TABLE IF NOT EXISTS respuestas (clave TEXT PRIMARY KEY, modelo TEXT, respuesta TEXT)'
+        )
+        self._conexion.commit()
+
+    @staticmethod
+    def clave(modelo, prompt, texto):
+        """Hash del modelo, el prompt compilado y el texto de entrada"""
+        contenido = '\x00'.join([modelo, prompt, str(texto)])
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+    def obtener(self, clave):
+        """Devuelve la respuesta guardada o None, y actualiza los contadores"""
+        with self._lock:
+            fila = self._conexion.execute('SELECT respuesta FROM respuestas WHERE clave = ?', (clave,)).fetchone()
+            if fila is None:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+            return fila[0]
+
+    def guardar(self, clave, modelo, respuesta):
+        """Guarda la respuesta y la confirma de inmediato para sobrevivir a una caída"""
+        with self._lock:
+            self._conexion.execute(
+                'INSERT OR REPLACE INTO respuestas (clave, modelo, respuesta) VALUES (?, ?, ?)',
+                (clave, modelo, respuesta)
+            )
+            self._conexion.commit()
+
+    def resumen(self):
+        total = self.aciertos + self.fallos
+        porcentaje = (self.aciertos / total) * 100 if total > 0 else 0
+        return f"Caché: {self.aciertos} aciertos, {self.fallos} fallos ({porcentaje:.2f}% de aciertos)"
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
@@ -0,0 +1,89 @@
+import os
+import re
+import sys
+import threading
+import unicodedata
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from parser_tripletas import TRUNCADO, ParserIncremental
+
+# Motivos por los que una fila pasa al siguiente modelo de la cascada
+ESQUEMA_INVALIDO = 'esquema_invalido'
+SIN_TRIPLETAS = 'sin_tripletas'
+SIN_SOPORTE = 'sin_soporte'
+
+def normalizar(texto):
+    """Minúsculas y sin acentos, para comparar palabras del texto y de las tripletas"""
+    texto = unicodedata.normalize('NFKD', str(texto).lower())
+    return ''.join(ch for ch in texto if not unicodedata.combining(ch))
+
+def palabras(texto):
+    return set(re.findall(r'\w{3,}', normalizar(texto)))
+
+def soporte(tripletas, text):
+    """Fracción de tripletas cuyo head y tail comparten al menos una palabra con el texto fuente"""
+    palabras_texto = palabras(text)
+    respaldadas = 0
+    for tripleta in tripletas:
+        head = palabras(tripleta.head)
+        tail = palabras(tripleta.tail)
+        # Entidades sin palabras de 3+ letras (números, siglas cortas) no se penalizan
+        if (not head or head & palabras_texto) and (not tail or tail & palabras_texto):
+            respaldadas += 1
+    return respaldadas / len(tripletas)
+
+def evaluar_salida(content, text, min_soporte=0.5):
+    """Devuelve None si la salida es aceptable, o el motivo para escalarla al siguiente modelo"""
+    # Se recorre toda la salida: un corchete en el texto que acompaña al array (por ejemplo "[1]") no la da por terminada
+    parser = ParserIncremental(parar_al_cerrar=False)
+    parser.feed(content or '')
+    parser.finalizar()
+    if parser.invalidas or parser.diagnostico[TRUNCADO]:
+        return ESQUEMA_INVALIDO
+    if not parser.tripletas:
+        return SIN_TRIPLETAS
+    if soporte(parser.tripletas, text) < min_soporte:
+        return SIN_SOPORTE
+    return None
+
+class ReporteCascada:
+    """
+    Cuenta por nivel de la cascada las llamadas, filas aceptadas, escaladas
+    (por motivo), tiempo y tokens. Las filas rechazadas en el último nivel no
+    se escalan: son fallos finales.
+    """
+
+    def __init__(self, models):
+        self.models = models
+        self._lock = threading.Lock()
+        self.niveles = {model: {'llamadas': 0, 'aceptadas': 0, 'segundos': 0.0, 'tokens_prompt': 0, 'tokens_completion': 0,
+                                ESQUEMA_INVALIDO: 0, SIN_TRIPLETAS: 0, SIN_SOPORTE: 0} for model in models}
+        self.sin_aceptar = 0
+
+    def registrar(self, model, segundos, usage, motivo):
+        with self._lock:
+            nivel = self.niveles[model]
+            nivel['llamadas'] += 1
+            nivel['segundos'] += segundos
+            nivel['tokens_prompt'] += usage.get('prompt_tokens') or 0
+            nivel['tokens_completion'] += usage.get('completion_tokens') or 0
+            if motivo is None:
+                nivel['aceptadas'] += 1
+            else:
+                nivel[motivo] += 1
+
+    def registrar_sin_aceptar(self):
+        with self._lock:
+            self.sin_aceptar += 1
+
+    def resumen(self):
+        lineas = ["Cascada de modelos:"]
+        for nivel, model in enumerate(self.models, start=1):
+            stats = self.niveles[model]
+            rechazadas = stats[ESQUEMA_INVALIDO] + stats[SIN_TRIPLETAS] + stats[SIN_SOPORTE]
+            destino = 'escaladas' if nivel < len(self.models) else 'fallos finales'
+            lineas.append(f" {nivel}. {model}: {stats['llamadas']} llamadas, {stats['aceptadas']} aceptadas, {rechazadas} {destino} "
+                          f"(esquema inválido {stats[ESQUEMA_INVALIDO]}, sin tripletas {stats[SIN_TRIPLETAS]}, sin soporte {stats[SIN_SOPORTE]}); "
+                          f"{stats['segundos']:.2f} s, {stats['tokens_prompt']} tokens de prompt, {stats['tokens_completion']} tokens de respuesta")
+        lineas.append(f" Filas sin salida aceptable en ningún nivel: {self.sin_aceptar}")
+        return '\n'.join(lineas)
@@ -0,0 +1,135 @@
+import os
+import json
+import hashlib
+
+# Instrucciones fijas: se envían idénticas en cada llamada para que Ollama reutilice su caché KV del prefijo
+INSTRUCCIONES = """Eres un experto en extracción de relaciones semánticas con formato estructurado JSON.
+Analiza el texto que se te indique y genera ÚNICAMENTE un array JSON. NO incluyas explicaciones ni texto adicional.
+
+IMPORTANTE:
+- La salida debe ser únicamente un array JSON parseable
+- Cada objeto del array debe tener exactamente estas claves: "head", "head_type", "relation", "tail", "tail_type"
+- No incluyas comentarios ni texto adicional"""
+
+INTRO_EJEMPLOS = "Aquí tienes algunos ejemplos de cómo extraer entidades y relaciones en formato JSON:"
+PETICION = "Siguiendo EXACTAMENTE el mismo formato de los ejemplos, analiza el siguiente texto:"
+PETICION_PAQUETE = """Siguiendo EXACTAMENTE el mismo formato de los ejemplos, analiza por separado cada uno de los siguientes textos. Cada texto va precedido de su identificador entre corchetes.
+Devuelve ÚNICAMENTE un objeto JSON cuyas claves sean los identificadores y cuyos valores sean el array JSON de tripletas de ese texto, por ejemplo: {"12": [...], "13": []}"""
+PISTA_LUGARES = "Lugares ya identificados en el texto (úsalos como entidades de tipo Lugar):"
+
+def estimar_tokens(texto):
+    """Estimación rápida de tokens (~4 caracteres por token), sin cargar el tokenizador del modelo"""
+    return (len(texto) + 3) // 4
+
+def format_example(example):
+    """Formatea un ejemplo para el prompt"""
+    return f"\nTexto de entrada: {example['input']}\nSalida JSON:\n{json.dumps(example['output'], indent=2, ensure_ascii=False)}\n"
+
+class IndiceEjemplos:
+    """Índice de embeddings de los ejemplos, calculado una vez y guardado junto al archivo de ejemplos"""
+
+    def __init__(self, examples, examples_filename=None, model_name='all-MiniLM-L6-v2'):
+        import numpy as np
+        from sentence_transformers import SentenceTransformer
+
+        self.np = np
+        self.model = SentenceTransformer(model_name)
+        inputs = [example['input'] for example in examples]
+        huella = hashlib.sha256(json.dumps([model_name, inputs], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+        ruta = f"{os.path.splitext(examples_filename)[0]}_embeddings.npz" if examples_filename else None
+        if ruta and os.path.exists(ruta):
+            guardado = np.load(ruta)
+            if str(guardado['huella']) == huella:
+                self.embeddings = guardado['embeddings']
+                return
+
+        self.embeddings = self.model.encode(inputs, normalize_embeddings=True)
+        if ruta:
+            np.savez(ruta, huella=huella, embeddings=self.embeddings)
+
+    def ordenar_por_similitud(self, text):
+        """Índices de los ejemplos ordenados de más a menos similar al texto"""
+        embedding = self.model.encode([text], normalize_embeddings=True)[0]
+        return list(self.np.argsort(-(self.embeddings @ embedding)))
+
+class PromptCompiler:
+    """
+    Compila el prompt de extracción una sola vez y lo completa por texto.
+
+    El mensaje de sistema (instrucciones) es siempre idéntico. Los ejemplos
+    van en el mensaje de usuario en el orden del archivo, de modo que si se
+    seleccionan todos el prefijo compartido llega hasta el texto de entrada.
+    Con k_ejemplos se eligen los k ejemplos más similares a cada texto, y
+    max_prompt_tokens descarta los menos similares (y en último caso recorta
+    el texto) hasta que el prompt estimado quepa en el presupuesto. Con un
+    gazetteer, los lugares encontrados en el texto se añaden después de él,
+    sin romper el prefijo compartido.
+    """
+
+    def __init__(self, examples, k_ejemplos=None, max_prompt_tokens=None, examples_filename=None, gazetteer=None):
+        self.examples = examples
+        self.gazetteer = gazetteer
+        self.k_ejemplos = k_ejemplos
+        self.max_prompt_tokens = max_prompt_tokens
+
+        # Partes estáticas, formateadas una sola vez
+        self.formatted_examples = [format_example(example) for example in examples]
+        self.tokens_examples = [estimar_tokens(formatted) for formatted in self.formatted_examples]
+        self.tokens_fijos = estimar_tokens(INSTRUCCIONES) + estimar_tokens(INTRO_EJEMPLOS) + estimar_tokens(PETICION)
+
+        self.indice = None
+        if k_ejemplos is not None and k_ejemplos < len(examples):
+            self.indice = IndiceEjemplos(examples, examples_filename)
+
+    def seleccionar_ejemplos(self, text):
+        """Índices de los ejemplos a incluir, respetando k y el presupuesto de tokens"""
+        if self.indice is not None:
+            candidatos = self.indice.ordenar_por_similitud(text)[:self.k_ejemplos]
+        else:
+            candidatos = list(range(len(self.examples)))
+
+        if self.max_prompt_tokens is not None:
+            disponibles = self.max_prompt_tokens - self.tokens_fijos - estimar_tokens(text)
+            seleccion = []
+            for i in candidatos:
+                if self.tokens_examples[i] <= disponibles:
+                    seleccion.append(i)
+                    disponibles -= self.tokens_examples[i]
+            candidatos = seleccion
+
+        return sorted(candidatos)
+
+    def compile(self, text):
+        """Devuelve los mensajes de chat para el texto"""
+        text = str(text)
+        if self.max_prompt_tokens is not None:
+            max_chars = max(0, (self.max_prompt_tokens - self.tokens_fijos) * 4)
+            if len(text) > max_chars:
+                print(f"Texto recortado a {max_chars} caracteres para respetar el presupuesto de {self.max_prompt_tokens} tokens")
+                text = text[:max_chars]
+
+        ejemplos = ''.join(self.formatted_examples[i] for i in self.seleccionar_ejemplos(text))
+        contenido = f"{INTRO_EJEMPLOS}{ejemplos}\n{PETICION}\n{text}" if ejemplos else f"{PETICION}\n{text}"
+        lugares = self.gazetteer.pista(text) if self.gazetteer is not None else []
+        if lugares:
+            contenido += f"\n\n{PISTA_LUGARES} {', '.join(lugares)}"
+        return [
+            {'role': 'system', 'content': INSTRUCCIONES},
+            {'role': 'user', 'content': contenido}
+        ]
+
+    def compile_pack(self, docs):
+        """Devuelve los mensajes de chat para un paquete de documentos (id, texto)"""
+        textos = '\n'.join(f"[{doc_id}] {text}" for doc_id, text in docs)
+        ejemplos = ''.join(self.formatted_examples[i] for i in self.seleccionar_ejemplos(textos))
+        contenido = f"{INTRO_EJEMPLOS}{ejemplos}\n{PETICION_PAQUETE}\n{textos}" if ejemplos else f"{PETICION_PAQUETE}\n{textos}"
+        return [
+            {'role': 'system', 'content': INSTRUCCIONES},
+            {'role': 'user', 'content': contenido}
+        ]
+
+    @staticmethod
+    def render(messages):
+        """Texto plano de los mensajes, usado como parte de la clave de caché"""
+        return '\n'.join(f"{message['role']}: {message['content']}" for message in messages)
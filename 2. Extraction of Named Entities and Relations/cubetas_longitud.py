@@ -0,0 +1,58 @@
+import bisect
+import threading
+
+from compilador_prompt import estimar_tokens
+
+LIMITES_POR_DEFECTO = [64, 256, 1024]
+
+def etiqueta_cubeta(cubeta, limites):
+    """Etiqueta legible de la cubeta, por ejemplo '65-256 tokens'"""
+    if cubeta == 0:
+        return f"<={limites[0]} tokens"
+    if cubeta == len(limites):
+        return f">{limites[-1]} tokens"
+    return f"{limites[cubeta - 1] + 1}-{limites[cubeta]} tokens"
+
+def agrupar_por_longitud(texts, limites):
+    """
+    Agrupa las posiciones de los textos en cubetas por tokens estimados.
+    Devuelve una lista (de la cubeta más corta a la más larga) con, para cada
+    cubeta, las posiciones ordenadas de menor a mayor longitud y sus tokens.
+    """
+    tokens = [estimar_tokens(str(text)) for text in texts]
+    cubetas = [[] for _ in range(len(limites) + 1)]
+    for posicion in sorted(range(len(texts)), key=tokens.__getitem__):
+        cubetas[bisect.bisect_left(limites, tokens[posicion])].append(posicion)
+    return cubetas, tokens
+
+def concurrencia_de(cubeta, concurrencias):
+    """Concurrencia de una cubeta; si hay menos valores que cubetas se repite el último"""
+    return concurrencias[min(cubeta, len(concurrencias) - 1)]
+
+class ReporteCubetas:
+    """Acumula filas, tokens estimados y tiempo por cubeta para ajustar la concurrencia de cada longitud"""
+
+    def __init__(self, limites):
+        self.limites = limites
+        self._lock = threading.Lock()
+        self.filas = [0] * (len(limites) + 1)
+        self.tokens = [0] * (len(limites) + 1)
+        self.segundos = [0.0] * (len(limites) + 1)
+
+    def registrar(self, cubeta, filas, tokens, segundos):
+        with self._lock:
+            self.filas[cubeta] += filas
+            self.tokens[cubeta] += tokens
+            self.segundos[cubeta] += segundos
+
+    def resumen(self):
+        lineas = ["Rendimiento por cubeta de longitud:"]
+        for cubeta in range(len(self.filas)):
+            if self.filas[cubeta] == 0:
+                continue
+            segundos = self.segundos[cubeta]
+            filas_por_segundo = self.filas[cubeta] / segundos if segundos > 0 else 0
+            tokens_por_segundo = self.tokens[cubeta] / segundos if segundos > 0 else 0
+            lineas.append(f" - {etiqueta_cubeta(cubeta, self.limites)}: {self.filas[cubeta]} filas en {segundos:.2f} s "
+                          f"({filas_por_segundo:.2f} filas/s, {tokens_por_segundo:.0f} tokens de entrada/s)")
+        return '\n'.join(lineas)
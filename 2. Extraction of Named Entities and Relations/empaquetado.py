@@ -0,0 +1,56 @@
+import re
+import json
+
+from compilador_prompt import estimar_tokens
+
+def empaquetar(docs, max_docs=8, max_tokens=None):
+    """
+    Agrupa documentos (id, texto) en paquetes de como máximo max_docs
+    documentos y max_tokens tokens estimados. Un documento que por sí solo
+    supera max_tokens forma su propio paquete.
+    """
+    paquete = []
+    tokens_paquete = 0
+    for doc_id, text in docs:
+        tokens = estimar_tokens(str(text))
+        lleno = len(paquete) >= max_docs or (max_tokens is not None and tokens_paquete + tokens > max_tokens)
+        if paquete and lleno:
+            yield paquete
+            paquete = []
+            tokens_paquete = 0
+        paquete.append((doc_id, text))
+        tokens_paquete += tokens
+    if paquete:
+        yield paquete
+
+def extraer_objeto_json(content):
+    """Recupera el objeto JSON de la respuesta, tolerando bloques ``` y texto alrededor"""
+    content = re.sub(r'```(?:json)?', '', content)
+    inicio = content.find('{')
+    fin = content.rfind('}')
+    if inicio == -1 or fin <= inicio:
+        return None
+    try:
+        objeto = json.loads(content[inicio:fin + 1])
+    except json.JSONDecodeError:
+        return None
+    return objeto if isinstance(objeto, dict) else None
+
+def separar_respuesta(content, doc_ids):
+    """
+    Reparte la respuesta de un paquete entre sus documentos.
+
+    Devuelve un diccionario id -> array JSON (como texto) solo con los
+    documentos presentes en la respuesta y cuyo valor es una lista; los
+    ausentes deben procesarse de forma individual.
+    """
+    objeto = extraer_objeto_json(content)
+    if objeto is None:
+        return {}
+
+    resultados = {}
+    for doc_id in doc_ids:
+        tripletas = objeto.get(str(doc_id))
+        if isinstance(tripletas, list):
+            resultados[doc_id] = json.dumps(tripletas, ensure_ascii=False)
+    return resultados
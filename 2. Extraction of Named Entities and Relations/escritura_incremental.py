@@ -0,0 +1,116 @@
+import os
+import json
+import pandas as pd
+
+FORMATOS = {'.csv': 'csv', '.jsonl': 'jsonl', '.parquet': 'parquet'}
+
+class EscritorIncremental:
+    """
+    Añade cada chunk procesado al archivo de salida en cuanto termina y
+    registra en un checkpoint el último id de fila confirmado.
+
+    CSV y JSONL se escriben en un único archivo en modo append. Parquet no
+    admite append, así que se escribe como un directorio con un archivo por
+    chunk, que pandas puede leer directamente con pd.read_parquet.
+
+    Las columnas del primer chunk escrito fijan las del archivo: los chunks
+    siguientes se reordenan a ellas (las que falten quedan vacías) para que
+    cada valor quede bajo su cabecera.
+    """
+
+    def __init__(self, output_filename, resume=False):
+        extension = os.path.splitext(output_filename)[1].lower()
+        if extension not in FORMATOS:
+            raise ValueError(f"Formato de salida no soportado: {extension} (use .csv, .jsonl o .parquet)")
+
+        self.output_filename = output_filename
+        self.formato = FORMATOS[extension]
+        self.checkpoint_filename = f"{output_filename}.checkpoint.json"
+        self.ultimo_id = None
+        self.filas_escritas = 0
+        self.columnas = None
+        self._bytes = 0
+
+        if resume and os.path.exists(self.checkpoint_filename):
+            self._restaurar()
+        else:
+            self._reiniciar()
+
+    def _restaurar(self):
+        with open(self.checkpoint_filename, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        self.ultimo_id = checkpoint['ultimo_id']
+        self.filas_escritas = checkpoint['filas_escritas']
+        self._bytes = checkpoint['bytes']
+        self.columnas = checkpoint.get('columnas')
+        if self.columnas is None and self.formato == 'csv' and self._bytes:
+            # Checkpoint anterior sin columnas: se toman de la cabecera del CSV
+            self.columnas = pd.read_csv(self.output_filename, nrows=0).columns.tolist()
+
+        # Descartar lo que se escribió después del último checkpoint (chunk a medio confirmar)
+        if self.formato != 'parquet' and os.path.exists(self.output_filename):
+            with open(self.output_filename, 'r+b') as f:
+                f.truncate(self._bytes)
+
+    def _reiniciar(self):
+        if self.formato == 'parquet':
+            os.makedirs(self.output_filename, exist_ok=True)
+            for parte in os.listdir(self.output_filename):
+                if parte.endswith('.parquet'):
+                    os.remove(os.path.join(self.output_filename, parte))
+        else:
+            open(self.output_filename, 'wb').close()
+        if os.path.exists(self.checkpoint_filename):
+            os.remove(self.checkpoint_filename)
+
+    def pendientes(self, chunk):
+        """Filtra las filas del chunk que ya están escritas según el checkpoint"""
+        if self.ultimo_id is None:
+            return chunk
+        return chunk[chunk.index > self.ultimo_id].copy()
+
+    def escribir(self, chunk):
+        """Escribe el chunk, fuerza el volcado a disco y actualiza el checkpoint"""
+        if len(chunk) == 0:
+            return
+
+        if self.columnas is None:
+            self.columnas = list(chunk.columns)
+        elif list(chunk.columns) != self.columnas:
+            sobrantes = [columna for columna in chunk.columns if columna not in self.columnas]
+            if sobrantes:
+                print(f"Columnas sin cabecera en {self.output_filename}, no se escriben: {', '.join(map(str, sobrantes))}")
+            chunk = chunk.reindex(columns=self.columnas)
+
+        if self.formato == 'parquet':
+            parte = os.path.join(self.output_filename, f"part-{chunk.index[0]:012d}.parquet")
+            chunk.to_parquet(parte, index=True)
+        else:
+            with open(self.output_filename, 'a', encoding='utf-8', newline='') as f:
+                if self.formato == 'csv':
+                    chunk.to_csv(f, header=self._bytes == 0, index=False)
+                else:
+                    lineas = chunk.to_json(orient='records', lines=True, force_ascii=False)
+                    f.write(lineas if lineas.endswith('\n') else lineas + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._bytes = os.path.getsize(self.output_filename)
+
+        self.ultimo_id = int(chunk.index[-1])
+        self.filas_escritas += len(chunk)
+        self._guardar_checkpoint()
+
+    def _guardar_checkpoint(self):
+        # Escritura atómica: un checkpoint nunca queda a medias
+        temporal = f"{self.checkpoint_filename}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({
+                'ultimo_id': self.ultimo_id,
+                'filas_escritas': self.filas_escritas,
+                'bytes': self._bytes,
+                'columnas': self.columnas,
+                'formato': self.formato
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.checkpoint_filename)
@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from backends_slm import RESPUESTA_POR_DEFECTO, respuesta_falsa
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Imita el endpoint /api/chat de Ollama con una latencia fija"""
+    latencia = 0.5
+    latencia_carga = 0.0
+    respuesta = json.dumps(RESPUESTA_POR_DEFECTO, ensure_ascii=False)
+
+    def do_POST(self):
+        if self.path == '/api/generate':
+            self._responder_generate()
+            return
+        if self.path != '/api/chat':
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        peticion = json.loads(self.rfile.read(length) or b'{}')
+        mensajes = peticion.get('messages', [])
+        prompt = ' '.join(m.get('content', '') for m in mensajes)
+        respuesta = respuesta_falsa(self.respuesta, mensajes[-1].get('content', '') if mensajes else '')
+
+        # Igual que Ollama, sin "stream": false la respuesta se envía por fragmentos
+        if peticion.get('stream', True):
+            self._responder_stream(peticion, prompt, respuesta)
+            return
+
+        # Simular el tiempo de generación del modelo
+        time.sleep(self.latencia)
+
+        payload = {
+            'model': peticion.get('model', ''),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'message': {'role': 'assistant', 'content': respuesta},
+            'done': True,
+            'done_reason': 'stop',
+            'prompt_eval_count': len(prompt.split()),
+            'eval_count': len(respuesta.split()),
+        }
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _responder_generate(self):
+        """Responde a /api/generate con prompt vacío, que Ollama usa para cargar o descargar un modelo"""
+        length = int(self.headers.get('Content-Length', 0))
+        peticion = json.loads(self.rfile.read(length) or b'{}')
+        time.sleep(self.latencia_carga)
+        payload = {
+            'model': peticion.get('model', ''),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'response': '',
+            'done': True,
+            'done_reason': 'unload' if peticion.get('keep_alive') == 0 else 'load',
+            'load_duration': int(self.latencia_carga * 1e9),
+        }
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _responder_stream(self, peticion, prompt, respuesta):
+        """Envía la respuesta en fragmentos NDJSON de ~4 caracteres, repartiendo la latencia entre ellos"""
+        fragmentos = [respuesta[i:i + 4] for i in range(0, len(respuesta), 4)] or ['']
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        try:
+            for fragmento in fragmentos:
+                time.sleep(self.latencia / len(fragmentos))
+                linea = {
+                    'model': peticion.get('model', ''),
+                    'created_at': datetime.now(timezone.utc).isoformat(),
+                    'message': {'role': 'assistant', 'content': fragmento},
+                    'done': False,
+                }
+                self.wfile.write((json.dumps(linea, ensure_ascii=False) + '\n').encode('utf-8'))
+                self.wfile.flush()
+            final = {
+                'model': peticion.get('model', ''),
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'message': {'role': 'assistant', 'content': ''},
+                'done': True,
+                'done_reason': 'stop',
+                'prompt_eval_count': len(prompt.split()),
+                'eval_count': len(fragmentos),
+            }
+            self.wfile.write((json.dumps(final, ensure_ascii=False) + '\n').encode('utf-8'))
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente cortó la generación (por ejemplo al cerrarse el array JSON)
+            pass
+
+    def log_message(self, format, *args):
+        # Silenciar el log de cada petición
+        pass
+
+def iniciar_servidor(host='127.0.0.1', puerto=0, latencia=0.5, respuesta=None, latencia_carga=0.0):
+    """Arranca el servidor falso en un hilo y devuelve el servidor y su URL"""
+    atributos = {'latencia': latencia, 'latencia_carga': latencia_carga}
+    if respuesta is not None:
+        atributos['respuesta'] = respuesta if isinstance(respuesta, str) else json.dumps(respuesta, ensure_ascii=False)
+    handler = type('FakeOllamaHandlerConfigurado', (FakeOllamaHandler,), atributos)
+
+    servidor = ThreadingHTTPServer((host, puerto), handler)
+    servidor.daemon_threads = True
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+
+    url = f"http://{servidor.server_address[0]}:{servidor.server_address[1]}"
+    return servidor, url
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servidor Ollama falso para pruebas de rendimiento')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=11435)
+    parser.add_argument('--latencia', type=float, default=0.5, help='Segundos de espera por petición')
+    args = parser.parse_args()
+
+    servidor, url = iniciar_servidor(args.host, args.puerto, args.latencia)
+    print(f"Servidor Ollama falso escuchando en {url} (latencia {args.latencia}s)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        servidor.shutdown()
@@ -0,0 +1,59 @@
+import threading
+import pandas as pd
+
+from compilador_prompt import estimar_tokens
+
+class FiltroTopicos:
+    """
+    Puerta de relevancia delante de la extracción: calcula la masa de los tópicos
+    relevantes (terremotos, desastres...) de cada fila y aparta las que no llegan
+    al umbral para que no se envíen al modelo.
+
+    Con matriz_topicos (el documento_topico.npy de lda_topic_llm.py) la masa es la
+    suma de las probabilidades de los tópicos relevantes; la fila de la matriz es
+    la columna columna_fila o, si no se indica, el índice del DataFrame. Sin matriz
+    se usan las columnas topico y probabilidad_topico: la masa es la probabilidad
+    del tópico principal si es relevante y 0 si no lo es.
+    """
+
+    def __init__(self, topicos, umbral=0.3, matriz_topicos=None, columna_fila=None):
+        self.topicos = sorted(set(topicos))
+        self.umbral = umbral
+        self.columna_fila = columna_fila
+        self.matriz = None
+        if matriz_topicos:
+            import numpy as np
+            self.matriz = np.load(matriz_topicos, mmap_mode='r')
+        self._lock = threading.Lock()
+        self.filas = 0
+        self.aceptadas = 0
+        self.tokens_evitados = 0
+
+    def masa(self, chunk):
+        """Masa de los tópicos relevantes de cada fila del chunk"""
+        if self.matriz is not None:
+            filas = chunk[self.columna_fila] if self.columna_fila else chunk.index
+            masas = self.matriz[list(filas)][:, self.topicos].sum(axis=1)
+            return pd.Series(masas, index=chunk.index, dtype=float)
+        relevante = chunk['topico'].isin(self.topicos)
+        return chunk['probabilidad_topico'].where(relevante, 0.0).astype(float)
+
+    def separar(self, chunk, text_column):
+        """Devuelve (filas que pasan al modelo, filas apartadas), ambas con la columna masa_topica"""
+        chunk = chunk.assign(masa_topica=self.masa(chunk))
+        mascara = chunk['masa_topica'] >= self.umbral
+        relevantes = chunk[mascara].copy()
+        apartadas = chunk[~mascara].copy()
+        tokens = sum(estimar_tokens(str(text)) for text in apartadas[text_column])
+        with self._lock:
+            self.filas += len(chunk)
+            self.aceptadas += len(relevantes)
+            self.tokens_evitados += tokens
+        return relevantes, apartadas
+
+    def resumen(self):
+        apartadas = self.filas - self.aceptadas
+        porcentaje = 100 * apartadas / self.filas if self.filas else 0
+        return (f"Filtro por tópicos (tópicos {self.topicos}, umbral {self.umbral}): {self.aceptadas} de {self.filas} filas "
+                f"enviadas al modelo, {apartadas} llamadas evitadas ({porcentaje:.1f}%), "
+                f"~{self.tokens_evitados} tokens de texto sin enviar")
@@ -0,0 +1,129 @@
+import re
+import json
+from collections import deque
+
+import pandas as pd
+
+class AhoCorasick:
+    """Autómata de Aho-Corasick: encuentra todas las apariciones de todos los patrones en una sola pasada por el texto"""
+
+    def __init__(self):
+        self.transiciones = [{}]
+        self.fallo = [0]
+        self.salidas = [[]]  # Longitudes de los patrones que terminan en cada estado
+
+    def agregar(self, patron):
+        estado = 0
+        for ch in patron:
+            siguiente = self.transiciones[estado].get(ch)
+            if siguiente is None:
+                siguiente = len(self.transiciones)
+                self.transiciones[estado][ch] = siguiente
+                self.transiciones.append({})
+                self.fallo.append(0)
+                self.salidas.append([])
+            estado = siguiente
+        if len(patron) not in self.salidas[estado]:
+            self.salidas[estado].append(len(patron))
+
+    def construir(self):
+        """Calcula los enlaces de fallo recorriendo el trie por niveles"""
+        cola = deque(self.transiciones[0].values())
+        while cola:
+            estado = cola.popleft()
+            for ch, siguiente in self.transiciones[estado].items():
+                cola.append(siguiente)
+                fallo = self.fallo[estado]
+                while fallo and ch not in self.transiciones[fallo]:
+                    fallo = self.fallo[fallo]
+                self.fallo[siguiente] = self.transiciones[fallo].get(ch, 0)
+                self.salidas[siguiente] = self.salidas[siguiente] + self.salidas[self.fallo[siguiente]]
+
+    def buscar(self, texto):
+        """Genera (inicio, fin) de cada aparición, incluidas las solapadas"""
+        estado = 0
+        for i, ch in enumerate(texto):
+            while estado and ch not in self.transiciones[estado]:
+                estado = self.fallo[estado]
+            estado = self.transiciones[estado].get(ch, 0)
+            for longitud in self.salidas[estado]:
+                yield i + 1 - longitud, i + 1
+
+class Gazetteer:
+    """
+    Lista de lugares conocidos buscada con Aho-Corasick, sin distinguir
+    mayúsculas y solo en límites de palabra. Se construye con la columna
+    location_text del corpus y, opcionalmente, con un archivo de lugares
+    (uno por línea).
+    """
+
+    def __init__(self, lugares, min_longitud=3):
+        self.automata = AhoCorasick()
+        self.total = 0
+        for lugar in {str(lugar).strip().lower() for lugar in lugares}:
+            if len(lugar) >= min_longitud:
+                self.automata.agregar(lugar)
+                self.total += 1
+        self.automata.construir()
+
+    @classmethod
+    def desde_csv(cls, filename, encoding="latin9", lugares_extra=None, **opciones):
+        columnas = pd.read_csv(filename, encoding=encoding, usecols=['location_type', 'location_text'], dtype=str)
+        lugares = columnas.loc[columnas['location_type'].notna(), 'location_text'].dropna().tolist()
+        if lugares_extra:
+            with open(lugares_extra, encoding='utf-8') as f:
+                lugares.extend(line for line in f if line.strip())
+        return cls(lugares, **opciones)
+
+    def lugares(self, texto):
+        """Entidades de lugar del texto (las más largas y sin solaparse), con sus posiciones"""
+        minusculas = texto.lower()
+        if len(minusculas) != len(texto):
+            minusculas = texto  # lower() cambió la longitud: se busca sin normalizar para no desplazar las posiciones
+        candidatos = sorted(self.automata.buscar(minusculas), key=lambda span: (span[0], -span[1]))
+
+        entidades = []
+        ultimo_fin = 0
+        for inicio, fin in candidatos:
+            if inicio < ultimo_fin:
+                continue
+            if (inicio > 0 and texto[inicio - 1].isalnum()) or (fin < len(texto) and texto[fin].isalnum()):
+                continue
+            entidades.append({'texto': texto[inicio:fin], 'inicio': inicio, 'fin': fin, 'tipo': 'Lugar'})
+            ultimo_fin = fin
+        return entidades
+
+    def pista(self, texto):
+        """Nombres de los lugares encontrados, sin repetir, para añadirlos al prompt"""
+        return list(dict.fromkeys(entidad['texto'] for entidad in self.lugares(texto)))
+
+    def solo_lugares(self, texto, entidades):
+        """True si, quitando los lugares, no queda ninguna palabra de tres o más letras"""
+        if not entidades:
+            return False
+        resto = []
+        inicio = 0
+        for entidad in entidades:
+            resto.append(texto[inicio:entidad['inicio']])
+            inicio = entidad['fin']
+        resto.append(texto[inicio:])
+        return not re.search(r'[^\W\d_]{3,}', ' '.join(resto))
+
+    def anotar(self, chunk, text_column, output_column, omitir_solo_lugares=False):
+        """
+        Añade la columna entidades_lugar. Con omitir_solo_lugares devuelve aparte
+        las filas que solo mencionan lugares, ya con una salida vacía, para no
+        enviarlas al modelo: (filas para el modelo, filas resueltas).
+        """
+        textos = chunk[text_column].astype(str)
+        entidades = [self.lugares(texto) for texto in textos]
+        chunk['entidades_lugar'] = [json.dumps(e, ensure_ascii=False) for e in entidades]
+        if not omitir_solo_lugares:
+            return chunk, chunk.iloc[:0]
+
+        mascara = pd.Series([self.solo_lugares(texto, e) for texto, e in zip(textos, entidades)], index=chunk.index)
+        resueltas = chunk[mascara].copy()
+        resueltas[output_column] = '[]'
+        resueltas['tokens_prompt'] = 0
+        resueltas['tokens_completion'] = 0
+        return chunk[~mascara].copy(), resueltas
@@ -0,0 +1,156 @@
+import re
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from NER_SLM import load_examples, process_df_chunk, process_df_chunk_concurrent
+from backends_slm import BACKENDS, crear_backend
+from cache_respuestas import CacheRespuestas
+from compilador_prompt import PromptCompiler
+from escritura_incremental import EscritorIncremental
+
+# Modelos comparados en el artículo
+MODELOS = ['llama2', 'olmo2', 'gemma3', 'deepseek', 'llama4', 'phi3', 'smollm2', 'qwen3:4b', 'orca-mini']
+
+def output_filename_for(plantilla, model):
+    """Nombre del archivo de salida de un modelo (qwen3:4b -> qwen3_4b)"""
+    return plantilla.format(modelo=re.sub(r'[^\w.-]', '_', model))
+
+def cargar_modelo(client, model, keep_alive='30m'):
+    """Carga el modelo en memoria de Ollama (prompt vacío) y devuelve los segundos que tardó"""
+    start_time = time.time()
+    client.generate(model=model, prompt='', keep_alive=keep_alive)
+    return time.time() - start_time
+
+def descargar_modelo(client, model):
+    """Libera la memoria del modelo en Ollama"""
+    client.generate(model=model, prompt='', keep_alive=0)
+
+class PlanificadorModelos:
+    """
+    Ejecuta la extracción con varios modelos cargando cada modelo una sola vez.
+
+    El corpus se lee una sola vez y se vuelca por bloques de block_size filas
+    a un spool local (un archivo Parquet por bloque). Después cada modelo se
+    carga, recorre el spool completo bloque a bloque y se descarga antes de
+    pasar al siguiente. La memoria queda acotada por el bloque y cada modelo
+    se carga exactamente una vez, sea cual sea el tamaño del corpus.
+    """
+
+    def __init__(self, models, compiler, client, plantilla_salida, cache=None, max_in_flight=1, structured=False, resume=False):
+        self.models = models
+        self.compiler = compiler
+        self.client = client
+        self.cache = cache
+        self.max_in_flight = max_in_flight
+        self.structured = structured
+        self.writers = {model: EscritorIncremental(output_filename_for(plantilla_salida, model), resume=resume) for model in models}
+        self.estadisticas = {model: {'cargas': 0, 'tiempo_carga': 0.0, 'tiempo_extraccion': 0.0, 'filas': 0} for model in models}
+        self.modelo_cargado = None
+        self.tiempo_spool = 0.0
+
+    def _activar(self, model):
+        if self.modelo_cargado == model:
+            return
+        if self.modelo_cargado is not None:
+            descargar_modelo(self.client, self.modelo_cargado)
+        print(f"Cargando modelo {model}...")
+        self.estadisticas[model]['tiempo_carga'] += cargar_modelo(self.client, model)
+        self.estadisticas[model]['cargas'] += 1
+        self.modelo_cargado = model
+
+    def volcar(self, filename, carpeta, block_size=5000, encoding="latin8"):
+        """Lee el corpus una vez y lo guarda por bloques en la carpeta del spool; devuelve los archivos"""
+        start_time = time.time()
+        bloques = []
+        for numero_bloque, block in enumerate(pd.read_csv(filename, encoding=encoding, chunksize=block_size)):
+            bloque_filename = os.path.join(carpeta, f"bloque_{numero_bloque:05d}.parquet")
+            block.to_parquet(bloque_filename)
+            bloques.append(bloque_filename)
+        self.tiempo_spool = time.time() - start_time
+        return bloques
+
+    def procesar_modelo(self, model, bloques, text_column, output_column):
+        """Pasa un modelo por todos los bloques del spool; se carga solo si queda alguna fila pendiente"""
+        writer = self.writers[model]
+        for bloque_filename in bloques:
+            chunk = writer.pendientes(pd.read_parquet(bloque_filename))
+            if chunk.empty:
+                continue
+
+            self._activar(model)
+            start_time = time.time()
+            if self.max_in_flight > 1:
+                processed_chunk = process_df_chunk_concurrent(chunk, text_column, output_column, self.compiler, self.client, max_in_flight=self.max_in_flight, cache=self.cache, structured=self.structured, model=model)
+            else:
+                processed_chunk = process_df_chunk(chunk, text_column, output_column, self.compiler, client=self.client, cache=self.cache, structured=self.structured, model=model)
+            writer.escribir(processed_chunk)
+
+            self.estadisticas[model]['tiempo_extraccion'] += time.time() - start_time
+            self.estadisticas[model]['filas'] += len(processed_chunk)
+
+        if self.modelo_cargado is not None:
+            descargar_modelo(self.client, self.modelo_cargado)
+            self.modelo_cargado = None
+
+    def ejecutar(self, filename, text_column, output_column, block_size=5000, encoding="latin8", carpeta_spool=None):
+        """Sin carpeta_spool el spool va a una carpeta temporal que se borra al terminar"""
+        start_time = time.time()
+        temporal = carpeta_spool is None
+        carpeta = tempfile.mkdtemp(prefix='spool_corpus_') if temporal else carpeta_spool
+        os.makedirs(carpeta, exist_ok=True)
+        try:
+            bloques = self.volcar(filename, carpeta, block_size=block_size, encoding=encoding)
+            for model in self.models:
+                self.procesar_modelo(model, bloques, text_column, output_column)
+        finally:
+            if temporal:
+                shutil.rmtree(carpeta, ignore_errors=True)
+        return time.time() - start_time
+
+    def reporte(self, tiempo_total):
+        print(f"\nTiempo total: {tiempo_total:.2f} s ({self.tiempo_spool:.2f} s leyendo el corpus al spool)")
+        for model, stats in self.estadisticas.items():
+            filas_por_segundo = stats['filas'] / stats['tiempo_extraccion'] if stats['tiempo_extraccion'] > 0 else 0
+            print(f" - {model}: {stats['cargas']} cargas, {stats['tiempo_carga']:.2f} s de carga, "
+                  f"{stats['tiempo_extraccion']:.2f} s de extracción, {stats['filas']} filas ({filas_por_segundo:.2f} filas/s)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extracción con varios modelos en una sola pasada por el corpus')
+    parser.add_argument('--modelos', nargs='+', default=MODELOS, help='Modelos de Ollama a comparar')
+    parser.add_argument('--entrada', default='C:/Users/LUIS VILCHES/Desktop/KG LLM/a_Datasets/GDELT_LDA_FILTRADO.csv')
+    parser.add_argument('--salida', default='C:/Users/LUIS VILCHES/Desktop/gdelt_fewshot_{modelo}.csv', help='Plantilla del archivo de salida; {modelo} se sustituye por cada modelo')
+    parser.add_argument('--bloque', type=int, default=5000, help='Filas por bloque del spool (memoria máxima por modelo)')
+    parser.add_argument('--spool', default=None, help='Carpeta donde guardar el corpus por bloques (por defecto, una carpeta temporal que se borra)')
+    parser.add_argument('--concurrencia', type=int, default=1, help='Peticiones simultáneas a Ollama (1 = secuencial)')
+    parser.add_argument('--timeout', type=float, default=None, help='Tiempo máximo por petición en segundos')
+    parser.add_argument('--backend', choices=list(BACKENDS), default='ollama', help='Servidor del modelo: ollama, openai o fake')
+    parser.add_argument('--host', default=None, help='URL del servidor')
+    parser.add_argument('--cache', default='cache_respuestas.sqlite', help='Archivo SQLite con las respuestas ya calculadas')
+    parser.add_argument('--sin-cache', action='store_true', help='Desactivar la caché de respuestas')
+    parser.add_argument('--estructurado', action='store_true', help='Restringir la salida al esquema JSON de tripletas')
+    parser.add_argument('--resume', action='store_true', help='Continuar desde el checkpoint de cada modelo')
+    args = parser.parse_args()
+
+    if '{modelo}' not in args.salida:
+        parser.error('--salida debe contener {modelo}')
+
+    examples_filename = 'ejemplos_desastres.json'
+    compiler = PromptCompiler(load_examples(examples_filename), examples_filename=examples_filename)
+    client = crear_backend(args.backend, host=args.host, timeout=args.timeout)
+    cache = None if args.sin_cache else CacheRespuestas(args.cache)
+
+    planificador = PlanificadorModelos(args.modelos, compiler, client, args.salida, cache=cache,
+                                       max_in_flight=args.concurrencia, structured=args.estructurado, resume=args.resume)
+    tiempo_total = planificador.ejecutar(args.entrada, 'texto_completo', 'TripletasLlama', block_size=args.bloque, carpeta_spool=args.spool)
+    planificador.reporte(tiempo_total)
+    for model in args.modelos:
+        print(f"Resultados de {model} en {os.path.abspath(output_filename_for(args.salida, model))}")
+    if cache is not None:
+        print(cache.resumen())
+        cache.cerrar()
@@ -0,0 +1,59 @@
+import pandas as pd
+
+class RepartoDuplicados:
+    """
+    Extrae solo el representante de cada grupo de casi duplicados (columnas de
+    deduplicacion.py) y copia sus tripletas a los demás miembros del grupo. La
+    columna tripletas_de guarda el id de la fila cuya extracción se usó. Sin
+    la columna de id, el id es el índice de la fila, como en deduplicacion.py.
+
+    Solo se guardan en memoria las salidas de los representantes de grupos con
+    más de un documento. Si no se conoce la salida del representante (por
+    ejemplo, al reanudar o si el filtro por tópicos lo apartó), la fila se
+    extrae normalmente.
+    """
+
+    def __init__(self, id_column='id'):
+        self.id_column = id_column
+        self.salidas = {}
+        self.copiadas = 0
+        self.extraidas_sin_representante = 0
+
+    def _ids(self, chunk):
+        if self.id_column in chunk:
+            return chunk[self.id_column].astype(str)
+        return pd.Series(chunk.index.astype(str), index=chunk.index)
+
+    def separar(self, chunk):
+        """Devuelve (filas a extraer, duplicados que recibirán la salida de su representante)"""
+        ids = self._ids(chunk)
+        representantes = chunk['representante_id'].astype(str)
+        es_representante = ids == representantes
+        disponibles = set(self.salidas) | set(ids[es_representante])
+        duplicado = ~es_representante & representantes.isin(disponibles)
+        self.extraidas_sin_representante += int((~es_representante & ~duplicado).sum())
+        return chunk[~duplicado].copy(), chunk[duplicado].copy()
+
+    def repartir(self, processed_chunk, duplicados, output_column):
+        """Guarda las salidas de los representantes y las copia a sus duplicados; devuelve el chunk completo"""
+        # tripletas_de va siempre al final, también si no hay filas extraídas, para que el chunk tenga las mismas columnas
+        processed_chunk = processed_chunk.copy()
+        processed_chunk['tripletas_de'] = self._ids(processed_chunk)
+        if not processed_chunk.empty:
+            ids = processed_chunk['tripletas_de']
+            con_grupo = pd.to_numeric(processed_chunk['tamano_grupo'], errors='coerce').fillna(1) > 1
+            self.salidas.update(zip(ids[con_grupo], processed_chunk.loc[con_grupo, output_column]))
+        if duplicados.empty:
+            return processed_chunk
+
+        representantes = duplicados['representante_id'].astype(str)
+        duplicados[output_column] = representantes.map(self.salidas)
+        duplicados['tripletas_de'] = representantes
+        duplicados['tokens_prompt'] = 0
+        duplicados['tokens_completion'] = 0
+        self.copiadas += len(duplicados)
+        return pd.concat([processed_chunk, duplicados]).sort_index()
+
+    def resumen(self):
+        return (f"Casi duplicados: {len(self.salidas)} grupos, {self.copiadas} filas con las tripletas de su representante "
+                f"(llamadas ahorradas), {self.extraidas_sin_representante} extraídas por no tener disponible su representante")
@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from parser_tripletas import CLAVES, ParserIncremental
+from compilador_prompt import estimar_tokens
+
+# Esquema JSON que se pasa a Ollama (parámetro format) para restringir la generación
+TRIPLETAS_SCHEMA = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': {clave: {'type': 'string'} for clave in CLAVES},
+        'required': list(CLAVES)
+    }
+}
+
+# Fragmentos que se siguen leyendo tras cerrarse el array, a la espera del fragmento final con los contadores
+MAX_FRAGMENTOS_FINALES = 8
+
+def stream_tripletas(client, model, messages, usage=None):
+    """
+    Pide al modelo la salida restringida al esquema, la consume como stream
+    y deja de generar en cuanto se cierra el array de primer nivel.
+    Devuelve el ParserIncremental con las tripletas tipadas.
+
+    Con el esquema el modelo termina justo después del "]", así que se lee
+    el fragmento final (done) para tomar de él los tokens reales de prompt y
+    de respuesta. Si no llega en MAX_FRAGMENTOS_FINALES fragmentos, se corta
+    y usage se rellena con una estimación marcada con tokens_estimados.
+    """
+    parser = ParserIncremental()
+    recibido = []
+    final = None
+    restantes = MAX_FRAGMENTOS_FINALES
+    stream = client.chat(model=model, messages=messages, format=TRIPLETAS_SCHEMA, stream=True)
+    try:
+        for parte in stream:
+            contenido = parte['message']['content']
+            recibido.append(contenido)
+            if not parser.done:
+                parser.feed(contenido)
+            if parte.get('done'):
+                final = parte
+                break
+            if parser.done:
+                restantes -= 1
+                if restantes < 0:
+                    break
+    finally:
+        # Cerrar el stream corta la conexión y Ollama detiene la generación
+        if hasattr(stream, 'close'):
+            stream.close()
+    parser.finalizar()
+
+    if usage is not None:
+        if final is not None:
+            usage['prompt_tokens'] = final.get('prompt_eval_count')
+            usage['completion_tokens'] = final.get('eval_count')
+        else:
+            usage['prompt_tokens'] = sum(estimar_tokens(message['content']) for message in messages)
+            usage['completion_tokens'] = estimar_tokens(''.join(recibido))
+            usage['tokens_estimados'] = True
+            print("Generación cortada antes del fragmento final: tokens de la fila estimados (~4 caracteres por token)")
+    return parser
@@ -1,32 +1,48 @@
+import os
+import sys
+import json
 import pandas as pd
 
-filename="C:....csv"
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from parser_tripletas import parsear_tripletas, resumen_diagnosticos
+from almacen_tripletas import AlmacenTripletas
 
-# Lee el archivo JSON
-with open(filename, 'r', encoding="latin9") as f:
-    datos = pd.read_csv(f)
-
-# Muestra el DataFrame
-datos.head(3)
-
-
-import re
+def tripletas_a_json(tripletas):
+    return json.dumps([tripleta._asdict() for tripleta in tripletas], ensure_ascii=False)
 
 def extract_brackets_content(text):
-    # Handle non-string types by converting them to strings
-    if not isinstance(text, str):
-        text = str(text)
-    # Utilizar una expresión regular para extraer el contenido entre corchetes
-    matches = re.findall(r'\[.*?\]', text, re.DOTALL)
-    return ' '.join(matches)
-
-# Aplicar la función a la columna 'TEXT'
-datos['Tripletas'] = datos['Tripletas'].apply(extract_brackets_content)
-
-
-datos.head(3)
-
-# Guardar el DataFrame procesado en un nuevo archivo JSON
-output_filename = 'C:.....csv'
-datos.to_csv(output_filename, encoding="latin9")
-print(f"Archivo procesado y guardado en {output_filename}")
+    # Recuperar con el parser común las tripletas válidas de la salida del modelo, como un único array JSON
+    tripletas, _ = parsear_tripletas(text)
+    return tripletas_a_json(tripletas)
+
+if __name__ == '__main__':
+    filename="C:....csv"
+
+    # Lee el archivo JSON
+    with open(filename, 'r', encoding="latin9") as f:
+        datos = pd.read_csv(f)
+
+    # Muestra el DataFrame
+    datos.head(3)
+
+    # Parsear la columna 'Tripletas' guardando el diagnóstico de cada fila
+    parseado = [parsear_tripletas(text) for text in datos['Tripletas']]
+    datos['Tripletas'] = [tripletas_a_json(tripletas) for tripletas, _ in parseado]
+    datos['diagnostico_parseo'] = [json.dumps(diagnostico) for _, diagnostico in parseado]
+    print(resumen_diagnosticos(diagnostico for _, diagnostico in parseado))
+
+    datos.head(3)
+
+    # Guardar el DataFrame procesado en un nuevo archivo JSON
+    output_filename = 'C:.....csv'
+    datos.to_csv(output_filename, encoding="latin9")
+    print(f"Archivo procesado y guardado en {output_filename}")
+
+    # Las mismas tripletas ya tipadas, con la fila de la que salen en id_documento, para que las etapas
+    # siguientes (Bespoke.py, LettuceDetect.py, Redundancy.py, ContextualRelevance.py) no vuelvan a parsear el texto
+    output_almacen = os.path.splitext(output_filename)[0] + '.parquet'
+    almacen = AlmacenTripletas()
+    for id_documento, (tripletas, _) in zip(datos.index, parseado):
+        almacen.agregar_varias(tripletas, id_documento=id_documento)
+    almacen.guardar(output_almacen)
+    print(f"{almacen.resumen()}; almacén guardado en {output_almacen}")
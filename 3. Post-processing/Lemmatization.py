@@ -1,15 +1,15 @@
-import json
 import spacy
 import os
+import time
+import argparse
+import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from almacen_tripletas import AlmacenTripletas, es_almacen
+from lectura_json import iterar_json_array, EscritorJsonArray
 
-nlp=spacy.load("es_core_news_lg")
-
-filename = "tripletas_gemma_traducidas.json"
-
-# Carga el archivo JSON de entrada
-with open(filename, 'r', encoding='utf-8') as f:
-    data = json.load(f)
+# Solo se necesitan el tokenizador, el etiquetado morfológico y el lematizador
+nlp = spacy.load("es_core_news_lg", disable=["parser", "ner"])
 
 # Constantes para las claves del JSON
 HEAD = 'head'
@@ -17,31 +17,89 @@ HEAD_TYPE = 'head_type'
 #RELATION = 'relation'  # Comentar/Descomentar según sea necesario
 TAIL = 'tail'
 TAIL_TYPE = 'tail_type'
+KEYS = [HEAD, HEAD_TYPE, TAIL, TAIL_TYPE]  # Añadir RELATION si es necesario
+
+# Textos a lematizar de un valor (un string o una lista de strings)
+def textos_de(value):
+    if isinstance(value, list):
+        return [text for item in value if item for text in textos_de(item)]
+    if isinstance(value, str):
+        return [value]
+    return []
+
+# Lematiza una sola vez cada texto distinto con nlp.pipe y devuelve {texto: lemas}
+def lemmatize_unique(texts, batch_size=1000, n_process=1):
+    unicos = list(dict.fromkeys(texts))
+    docs = nlp.pipe(unicos, batch_size=batch_size, n_process=n_process)
+    return {text: ' '.join(token.lemma_ for token in doc) for text, doc in zip(unicos, docs)}
+
+# Lemas de un valor (un string o una lista de strings, unidos por espacios), consultando los lemas ya calculados; '' si no es texto
+def lemmatize_cached(value, lemmas):
+    if isinstance(value, list):
+        return ' '.join([lemmatize_cached(item, lemmas) for item in value if item])
+    if isinstance(value, str):
+        return lemmas[value]
+    return ''
+
+# Lematiza en el sitio las claves de las entradas; lemmas guarda los lemas ya calculados entre llamadas
+def lematizar_entradas(entries, lemmas, batch_size=1000, n_process=1):
+    nuevos = [text for entry in entries if isinstance(entry, dict) for key in KEYS for text in textos_de(entry.get(key, '')) if text not in lemmas]
+    if nuevos:
+        lemmas.update(lemmatize_unique(nuevos, batch_size=batch_size, n_process=n_process))
+    for entry in entries:
+        if isinstance(entry, dict):
+            for key in KEYS:
+                entry[key] = lemmatize_cached(entry.get(key, ''), lemmas)
+
+# Lematiza las claves de un almacén columnar: cada texto distinto una vez, difundido a sus filas.
+# A diferencia de las entradas JSON, los valores que faltan siguen faltando en lugar de quedar ''
+def lematizar_almacen(almacen, lemmas, batch_size=1000, n_process=1):
+    def lematizar(textos):
+        nuevos = [text for text in textos if text not in lemmas]
+        if nuevos:
+            lemmas.update(lemmatize_unique(nuevos, batch_size=batch_size, n_process=n_process))
+        return [lemmas[text] for text in textos]
+    return almacen.aplicar(lematizar, KEYS)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Lematización de las tripletas')
+    parser.add_argument('--entrada', default="tripletas_gemma_traducidas.json", help='JSON con la lista de tripletas o almacén de tripletas (.parquet, .arrow)')
+    parser.add_argument('--salida', default='tripletas_gemma_lemma.json')
+    parser.add_argument('--lote', type=int, default=1000, help='Textos por lote de nlp.pipe')
+    parser.add_argument('--procesos', type=int, default=1, help='Procesos de nlp.pipe (n_process)')
+    args = parser.parse_args()
+
+    filename = args.entrada
+    output_filename = args.salida
+    start_time = time.time()
+
+    if es_almacen(filename):
+        almacen = AlmacenTripletas.cargar(filename)
+        lemmas = {}
+        lematizar_almacen(almacen, lemmas, batch_size=args.lote, n_process=args.procesos)
+        almacen.guardar(output_filename)
+        print(f"Archivo actualizado guardado como {output_filename}.")
+        print(f"{almacen.resumen()}; {len(lemmas)} textos distintos lematizados en {time.time() - start_time:.2f} s")
+    else:
+        # Primera pasada en streaming: solo se guardan los textos distintos de las claves a lematizar
+        unicos = {}
+        total_textos = 0
+        for entry in iterar_json_array(filename):
+            if isinstance(entry, dict):
+                for key in KEYS:
+                    textos = textos_de(entry.get(key, ''))
+                    total_textos += len(textos)
+                    unicos.update(dict.fromkeys(textos))
+
+        lemmas = lemmatize_unique(unicos, batch_size=args.lote, n_process=args.procesos)
 
-# Función para lematizar un texto
-def lemmatize_text(text):
-    if text is not None:
-        if isinstance(text, list):
-            return ' '.join([lemmatize_text(item) for item in text if item])
-        elif isinstance(text, str):  # Verificar que text sea de tipo string
-            doc = nlp(text)
-            return ' '.join(token.lemma_ for token in doc)
-    return ''  # Retorna una cadena vacía si text es None o no es válido
-
-
-# Procesar y lematizar cada entrada en los datos
-for entry in data:
-    if isinstance(entry, dict):
-        entry[HEAD] = lemmatize_text(entry.get(HEAD, ''))
-        entry[HEAD_TYPE] = lemmatize_text(entry.get(HEAD_TYPE, ''))
-        #entry[RELATION] = lemmatize_text(entry.get(RELATION, ''))  # Descomentar si es necesario
-        entry[TAIL] = lemmatize_text(entry.get(TAIL, ''))
-        entry[TAIL_TYPE] = lemmatize_text(entry.get(TAIL_TYPE, ''))
-
-# Guardar el archivo JSON actualizado
-output_filename = 'tripletas_gemma_lemma.json'
-with open(output_filename, 'w',  encoding='utf-8') as f:
-    json.dump(data, f, ensure_ascii=False, indent=4)
-
-print(f"Archivo actualizado guardado como {output_filename}.")
+        # Segunda pasada: procesar y lematizar cada entrada escribiéndola en cuanto está lista
+        writer = EscritorJsonArray(output_filename)
+        for entry in iterar_json_array(filename):
+            lematizar_entradas([entry], lemmas)
+            writer.escribir(entry)
+        writer.cerrar()
 
+        elapsed_time = time.time() - start_time
+        print(f"Archivo actualizado guardado como {output_filename}.")
+        print(f"{total_textos} textos lematizados ({len(lemmas)} distintos) en {elapsed_time:.2f} s")
@@ -1,32 +1,69 @@
 import json
 import nltk
+import sys
+import time
+import argparse
+from nltk.corpus import stopwords
 
-# Lee el archivo JSON
-with open("C:....json", 'r', encoding="utf-8") as f:
-    data = json.load(f)
+inicio_script = time.time()
 
+# Pasa a minúsculas los campos de texto de cada tripleta
+def lowercase_entries(data):
+    for entry in data:
+        if 'head' in entry and isinstance(entry['head'], str):
+            entry['head'] = entry['head'].lower()
+        if 'head_type' in entry and isinstance(entry['head_type'], str):
+            entry['head_type'] = entry['head_type'].lower()
+        if 'relation' in entry and isinstance(entry['relation'], str):
+            entry['relation'] = entry['relation'].lower()
+        if 'tail' in entry and isinstance(entry['tail'], str):
+            entry['tail'] = entry['tail'].lower()
+        if 'tail_type' in entry and isinstance(entry['tail_type'], str):
+            entry['tail_type'] = entry['tail_type'].lower()
 
-for entry in data:
-    if 'head' in entry and isinstance(entry['head'], str):
-        entry['head'] = entry['head'].lower()
-    if 'head_type' in entry and isinstance(entry['head_type'], str):
-        entry['head_type'] = entry['head_type'].lower()
-    if 'relation' in entry and isinstance(entry['relation'], str):
-        entry['relation'] = entry['relation'].lower()
-    if 'tail' in entry and isinstance(entry['tail'], str):
-        entry['tail'] = entry['tail'].lower()
-    if 'tail_type' in entry and isinstance(entry['tail_type'], str):
-        entry['tail_type'] = entry['tail_type'].lower()
 
-
-from transformers import pipeline
 from sentence_transformers import SentenceTransformer, util
 
 
-# Inicializar modelos
-summarizer = pipeline("summarization", model="t5-large", tokenizer="t5-large")
+# Inicializar modelos: t5-large (770M parámetros) no se carga hasta que algún texto lo necesita
+summarizer = None
+tiempo_carga_resumidor = 0.0
 semantic_model = SentenceTransformer('all-MiniLM-L6-v2')
 
+nltk.download('stopwords', quiet=True)
+STOP_WORDS = set(stopwords.words('spanish')) | set(stopwords.words('english'))
+
+def obtener_resumidor():
+    """Devuelve el resumidor t5-large, cargándolo la primera vez"""
+    global summarizer, tiempo_carga_resumidor
+    if summarizer is None:
+        from transformers import pipeline
+        start_time = time.time()
+        summarizer = pipeline("summarization", model="t5-large", tokenizer="t5-large")
+        tiempo_carga_resumidor = time.time() - start_time
+    return summarizer
+
+def memoria_maxima_mb():
+    """Pico de memoria residente del proceso en MB (None si el sistema no lo expone, como en Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+def acortar_extractivo(text, max_tokens=6):
+    """
+    Acortado extractivo: quita stopwords, puntuación y palabras repetidas y se
+    queda con las primeras max_tokens palabras de contenido, en su orden.
+    """
+    palabras = []
+    for token in nltk.word_tokenize(text):
+        if any(ch.isalnum() for ch in token) and token.lower() not in STOP_WORDS and token not in palabras:
+            palabras.append(token)
+    return ' '.join(palabras[:max_tokens])
+
 def smart_truncate(text, max_tokens=6, max_chars=200):
     """
     Trunca el texto de manera inteligente, asegurando palabras completas.
@@ -92,26 +129,133 @@ def process_entry(entry, summarizer, semantic_model, max_tokens=6):
     
     return metrics
 
-# Procesar JSON
-processed_data = []
-all_metrics = []
+# Resume cada texto truncado distinto en lotes ordenados por longitud
+def resumir_en_lotes(truncados, batch_size=32):
+    summarizer = obtener_resumidor()
+    truncados = sorted(set(truncados), key=len)
+    resumenes = {}
+    for inicio in range(0, len(truncados), batch_size):
+        lote = truncados[inicio:inicio + batch_size]
+        try:
+            salidas = summarizer(lote, max_length=15, min_length=6, do_sample=False, batch_size=batch_size)
+            resumenes.update((truncated_text, salida['summary_text']) for truncated_text, salida in zip(lote, salidas))
+        except Exception as e:
+            # Si falla el lote se resume texto a texto para aislar el que da error
+            print(f"Error al resumir un lote de {len(lote)} textos: {e}")
+            for truncated_text in lote:
+                try:
+                    resumenes[truncated_text] = summarizer(truncated_text, max_length=15, min_length=6, do_sample=False)[0]['summary_text']
+                except Exception as e:
+                    print(f"Error al resumir '{truncated_text}': {e}")
+                    resumenes[truncated_text] = truncated_text
+    return resumenes
+
+# Modo en dos fases: reúne los textos largos de todo el archivo y acorta cada texto distinto una sola
+# vez, con los embeddings calculados en lotes. Con umbral_extractivo se prueba primero el acortado
+# extractivo y solo los textos cuya similitud queda por debajo del umbral pasan a t5-large
+def process_entries_batched(entries, semantic_model, max_tokens=6, batch_size=32, umbral_extractivo=None, conteo=None):
+    keys_to_process = ['head', 'relation', 'tail']
+    conteo = conteo if conteo is not None else {}
+    conteo.setdefault('extractivo', 0)
+    conteo.setdefault('abstractivo', 0)
 
-for entry in data:
-    if isinstance(entry, dict):  # Asegurar que cada entrada sea un diccionario
-        metrics = process_entry(entry, summarizer, semantic_model)
-        processed_data.append(entry)
+    # Fase 1: textos distintos a acortar
+    largos = {}
+    for entry in entries:
+        for key in keys_to_process:
+            text = entry.get(key, "")
+            if isinstance(text, str) and len(text.split()) > max_tokens and text not in largos:
+                largos[text] = smart_truncate(text, max_tokens=max_tokens)
+
+    # Fase 2: acortado por niveles y coherencia semántica con el original
+    originales = list(largos)
+    acortados = {}
+    similitudes = {}
+    if originales:
+        embeddings_originales = semantic_model.encode(originales, batch_size=batch_size, convert_to_tensor=True)
+        pendientes = list(range(len(originales)))
+
+        if umbral_extractivo is not None:
+            extractivos = [acortar_extractivo(text, max_tokens=max_tokens) for text in originales]
+            embeddings_extractivos = semantic_model.encode(extractivos, batch_size=batch_size, convert_to_tensor=True)
+            pendientes = []
+            for i, similitud in enumerate(util.pairwise_cos_sim(embeddings_originales, embeddings_extractivos).tolist()):
+                if extractivos[i] and similitud >= umbral_extractivo:
+                    acortados[originales[i]] = extractivos[i]
+                    similitudes[originales[i]] = similitud
+                else:
+                    pendientes.append(i)
+
+        if pendientes:
+            resumenes = resumir_en_lotes([largos[originales[i]] for i in pendientes], batch_size=batch_size)
+            summarized = [resumenes[largos[originales[i]]] for i in pendientes]
+            embeddings_resumenes = semantic_model.encode(summarized, batch_size=batch_size, convert_to_tensor=True)
+            for i, resumen, similitud in zip(pendientes, summarized, util.pairwise_cos_sim(embeddings_originales[pendientes], embeddings_resumenes).tolist()):
+                acortados[originales[i]] = resumen
+                similitudes[originales[i]] = similitud
+
+        conteo['extractivo'] += len(originales) - len(pendientes)
+        conteo['abstractivo'] += len(pendientes)
+
+    all_metrics = []
+    for entry in entries:
+        metrics = {}
+        for key in keys_to_process:
+            text = entry.get(key, "")
+            # Solo los textos son claves de similitudes (una lista u otro valor no hashable no se acorta)
+            if isinstance(text, str) and text in similitudes:
+                entry[key] = acortados[text]  # Actualizar con el texto acortado
+                metrics[f'{key}_similarity'] = similitudes[text]
+            else:
+                metrics[f'{key}_similarity'] = None  # No aplica
         all_metrics.append(metrics)
+    return all_metrics
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Acortado de head, relation y tail largos')
+    parser.add_argument('--entrada', default="C:....json")
+    parser.add_argument('--salida', default="C:....json")
+    parser.add_argument('--metricas', default="C:...json")
+    parser.add_argument('--lote', type=int, default=32, help='Textos por lote del resumidor y de encode')
+    parser.add_argument('--por-entrada', action='store_true', help='Procesar entrada a entrada (modo anterior, sin lotes)')
+    parser.add_argument('--umbral-extractivo', type=float, default=0.8, help='Similitud mínima para aceptar el acortado extractivo sin usar t5-large')
+    parser.add_argument('--sin-extractivo', action='store_true', help='Resumir todos los textos largos con t5-large')
+    args = parser.parse_args()
+
+    # Lee el archivo JSON
+    with open(args.entrada, 'r', encoding="utf-8") as f:
+        data = json.load(f)
+    lowercase_entries(data)
+
+    # Procesar JSON
+    processed_data = [entry for entry in data if isinstance(entry, dict)]  # Asegurar que cada entrada sea un diccionario
+    tiempo_arranque = time.time() - inicio_script
+    start_time = time.time()
+    conteo = {}
+    if args.por_entrada:
+        all_metrics = [process_entry(entry, obtener_resumidor(), semantic_model) for entry in processed_data]
+    else:
+        umbral = None if args.sin_extractivo else args.umbral_extractivo
+        all_metrics = process_entries_batched(processed_data, semantic_model, batch_size=args.lote, umbral_extractivo=umbral, conteo=conteo)
+    print(f"{len(processed_data)} entradas procesadas en {time.time() - start_time:.2f} s")
+    if conteo:
+        print(f"Textos acortados: {conteo['extractivo']} con el paso extractivo, {conteo['abstractivo']} con t5-large")
+    print(f"Arranque (imports, modelo de similitud y lectura): {tiempo_arranque:.2f} s; "
+          f"carga de t5-large: {f'{tiempo_carga_resumidor:.2f} s' if summarizer is not None else 'no fue necesaria'}")
+    pico = memoria_maxima_mb()
+    if pico is not None:
+        print(f"Pico de memoria residente: {pico:.0f} MB")
 
-# Exportar JSON modificado
-output_file = "C:....json"
-with open(output_file, 'w', encoding='utf-8') as file:
-    json.dump(processed_data, file, ensure_ascii=False, indent=2)
+    # Exportar JSON modificado
+    output_file = args.salida
+    with open(output_file, 'w', encoding='utf-8') as file:
+        json.dump(processed_data, file, ensure_ascii=False, indent=2)
 
-# Exportar métricas
-metrics_file = "C:...json"
-with open(metrics_file, 'w', encoding='utf-8') as file:
-    json.dump(all_metrics, file, ensure_ascii=False, indent=2)
+    # Exportar métricas
+    metrics_file = args.metricas
+    with open(metrics_file, 'w', encoding='utf-8') as file:
+        json.dump(all_metrics, file, ensure_ascii=False, indent=2)
 
-# Descargar archivos procesados
-#files.download(output_file)
-#files.download(metrics_file)
\ No newline at end of file
+    # Descargar archivos procesados
+    #files.download(output_file)
+    #files.download(metrics_file)
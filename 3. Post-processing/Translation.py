@@ -1,6 +1,15 @@
 from transformers import MarianMTModel, MarianTokenizer
 import torch
 import json
+import time
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from almacen_tripletas import AlmacenTripletas, es_almacen
+from memoria_traduccion import MemoriaTraduccion
+from identificacion_idioma import IdentificadorIdioma
 
 # Carga el modelo en GPU si está disponible
 device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -12,8 +21,12 @@ model = MarianMTModel.from_pretrained(model_name).to(device)
 # Claves que serán traducidas
 TRANSLATABLE_KEYS = ['head', 'relation', 'tail']
 
-# Diccionario para contar las traducciones realizadas por clave
-translation_counts = {key: 0 for key in TRANSLATABLE_KEYS}
+# Motivos de la decisión del filtro de idioma para cada texto
+TRADUCIR = 'traducir'
+NO_INGLES = 'no_ingles'
+BAJA_CONFIANZA = 'baja_confianza'
+SIN_LETRAS = 'sin_letras'
+MOTIVOS = [TRADUCIR, NO_INGLES, BAJA_CONFIANZA, SIN_LETRAS]
 
 # Función para traducir un texto solo si está en inglés
 def translate_text_if_english(text):
@@ -26,40 +39,165 @@ def translate_text_if_english(text):
             print(f"Error de traducción para '{text}': {e}")
     return text  # Devuelve el texto original si hay error
 
-# Nombre del archivo JSON de entrada y salida
-filename = "C:.....json"
-output_filename = "C:......json"
+# Traduce una lista de textos en lotes; ordenarlos por longitud reduce el relleno de cada lote
+def translate_batch(texts, batch_size=32):
+    traducciones = [None] * len(texts)
+    orden = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    for inicio in range(0, len(orden), batch_size):
+        posiciones = orden[inicio:inicio + batch_size]
+        lote = [texts[i] for i in posiciones]
+        try:
+            with torch.no_grad():
+                inputs = tokenizer(lote, return_tensors="pt", padding=True, truncation=True).to(device)
+                translated = model.generate(**inputs)
+            for i, traduccion in zip(posiciones, tokenizer.batch_decode(translated, skip_special_tokens=True)):
+                traducciones[i] = traduccion
+        except Exception as e:
+            # Las posiciones del lote se quedan en None y se conserva el texto original
+            print(f"Error de traducción en un lote de {len(lote)} textos: {e}")
+    return traducciones
+
+# Traduce cada texto distinto una sola vez, consultando y completando la memoria de traducción;
+# si se pasa la lista enviados, se añaden los textos que no estaban en la memoria y llegan al modelo
+def translate_unique(texts, memoria=None, batch_size=32, enviados=None):
+    unicos = list(dict.fromkeys(text for text in texts if isinstance(text, str) and text))
+    conocidas = memoria.obtener_varios(unicos) if memoria is not None else {}
+    pendientes = [text for text in unicos if text not in conocidas]
+    if enviados is not None:
+        enviados.extend(pendientes)
+
+    nuevas = {text: traduccion for text, traduccion in zip(pendientes, translate_batch(pendientes, batch_size)) if traduccion is not None}
+    if memoria is not None and nuevas:
+        memoria.guardar_varios(nuevas.items())
+    conocidas.update(nuevas)
+    return conocidas
 
-# Carga el archivo JSON de entrada
-with open(filename, 'r', encoding='utf-8') as f:
-    data = json.load(f)
+# Decide qué textos distintos llegan al traductor: solo los detectados como inglés con confianza suficiente
+def filtrar_ingles(texts, identificador, umbral=0.9):
+    decisiones = {}
+    for text in dict.fromkeys(text for text in texts if isinstance(text, str) and text):
+        idioma, confianza = identificador.detectar(text)
+        if idioma is None:
+            decisiones[text] = SIN_LETRAS
+        elif idioma != 'en':
+            decisiones[text] = NO_INGLES
+        elif confianza < umbral:
+            decisiones[text] = BAJA_CONFIANZA
+        else:
+            decisiones[text] = TRADUCIR
+    return decisiones
 
-# Itera sobre cada entrada de la lista
-for entry in data:
-    if isinstance(entry, dict):
+# Traduce en el sitio las claves traducibles de las entradas, reuniendo primero todos los textos
+# para traducir cada valor distinto una sola vez, y acumula las estadísticas por clave
+def traducir_entradas(data, memoria=None, batch_size=32, identificador=None, umbral=0.9, translation_counts=None, decision_counts=None, enviados=None):
+    entries = [entry for entry in data if isinstance(entry, dict)]
+    textos = [entry[key] for entry in entries for key in TRANSLATABLE_KEYS if key in entry]
+    if identificador is None:
+        decisiones = {text: TRADUCIR for text in textos if isinstance(text, str) and text}
+    else:
+        decisiones = filtrar_ingles(textos, identificador, umbral=umbral)
+    traducciones = translate_unique([text for text, motivo in decisiones.items() if motivo == TRADUCIR], memoria=memoria, batch_size=batch_size,
+                                    enviados=enviados)
+
+    # Itera sobre cada entrada de la lista
+    for entry in entries:
         for key in TRANSLATABLE_KEYS:
             if key in entry:
                 original_text = entry[key]
-                translated_text = translate_text_if_english(original_text)
-                
-                if translated_text != original_text:
+                if not isinstance(original_text, str) or original_text not in decisiones:
+                    continue
+                if decision_counts is not None:
+                    decision_counts[key][decisiones[original_text]] += 1
+                translated_text = traducciones.get(original_text, original_text)
+
+                if translated_text != original_text and translation_counts is not None:
                     translation_counts[key] += 1  # Cuenta la traducción
-                
+
                 entry[key] = translated_text
+    return textos, decisiones, traducciones
+
+# Igual que traducir_entradas, sobre un almacén columnar: las decisiones y traducciones se calculan
+# para los textos distintos y se difunden a todas sus filas
+def traducir_almacen(almacen, memoria=None, batch_size=32, identificador=None, umbral=0.9, decision_counts=None, enviados=None):
+    _, textos = almacen.unicos(TRANSLATABLE_KEYS)
+    if identificador is None:
+        decisiones = {text: TRADUCIR for text in textos if text}
+    else:
+        decisiones = filtrar_ingles(textos, identificador, umbral=umbral)
+    if decision_counts is not None:
+        for key in TRANSLATABLE_KEYS:
+            for text, filas in almacen.frecuencias(key).items():
+                if text in decisiones:
+                    decision_counts[key][decisiones[text]] += filas
+    traducciones = translate_unique([text for text, motivo in decisiones.items() if motivo == TRADUCIR], memoria=memoria, batch_size=batch_size,
+                                    enviados=enviados)
+    translation_counts = almacen.aplicar(lambda textos: [traducciones.get(text, text) for text in textos], TRANSLATABLE_KEYS)
+    return textos, decisiones, traducciones, translation_counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Traducción al español de las tripletas')
+    parser.add_argument('--entrada', default="C:.....json", help='JSON con la lista de tripletas o almacén de tripletas (.parquet, .arrow)')
+    parser.add_argument('--salida', default="C:......json")
+    parser.add_argument('--memoria', default='memoria_traduccion.sqlite', help='Archivo SQLite con las traducciones ya hechas')
+    parser.add_argument('--sin-memoria', action='store_true', help='No usar la memoria de traducción')
+    parser.add_argument('--lote', type=int, default=32, help='Textos por lote de generate')
+    parser.add_argument('--umbral-idioma', type=float, default=0.9, help='Confianza mínima de que un texto está en inglés para traducirlo')
+    parser.add_argument('--sin-filtro-idioma', action='store_true', help='Traducir todos los textos sin identificar su idioma')
+    args = parser.parse_args()
+
+    # Nombre del archivo JSON de entrada y salida
+    filename = args.entrada
+    output_filename = args.salida
+
+    memoria = None if args.sin_memoria else MemoriaTraduccion(args.memoria, modelo=model_name)
+
+    # Diccionario para contar las traducciones realizadas por clave
+    translation_counts = {key: 0 for key in TRANSLATABLE_KEYS}
+    # Decisiones del filtro de idioma por clave
+    decision_counts = {key: {motivo: 0 for motivo in MOTIVOS} for key in TRANSLATABLE_KEYS}
+    # Textos distintos que no estaban en la memoria y se enviaron a MarianMT
+    enviados = []
+
+    start_time = time.time()
+    identificador = None if args.sin_filtro_idioma else IdentificadorIdioma()
+    if es_almacen(filename):
+        almacen = AlmacenTripletas.cargar(filename)
+        textos, decisiones, traducciones, translation_counts = traducir_almacen(almacen, memoria=memoria, batch_size=args.lote, identificador=identificador,
+                                                                                umbral=args.umbral_idioma, decision_counts=decision_counts, enviados=enviados)
+        total_textos = sum(sum(almacen.frecuencias(key).values()) for key in TRANSLATABLE_KEYS)
+        elapsed_time = time.time() - start_time
+        almacen.guardar(output_filename)
+    else:
+        # Carga el archivo JSON de entrada
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        textos, decisiones, traducciones = traducir_entradas(data, memoria=memoria, batch_size=args.lote, identificador=identificador, umbral=args.umbral_idioma,
+                                                             translation_counts=translation_counts, decision_counts=decision_counts, enviados=enviados)
+        total_textos = len(textos)
+        elapsed_time = time.time() - start_time
+
+        # Guarda el archivo JSON modificado
+        with open(output_filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+
+    # Imprime estadísticas de traducción
+    print(f"Archivo '{output_filename}' actualizado correctamente con las traducciones.")
+    print(f"{total_textos} textos ({len(decisiones)} distintos, {len(enviados)} enviados al traductor) procesados en {elapsed_time:.2f} s")
+    if memoria is not None:
+        print(memoria.resumen())
+        memoria.cerrar()
+    print("Estadísticas de traducción:")
+    for key, count in translation_counts.items():
+        print(f" - {key}: {count} traducciones realizadas")
+    print("Filtro de idioma (textos traducidos frente a omitidos):")
+    for key, counts in decision_counts.items():
+        print(f" - {key}: {counts[TRADUCIR]} en inglés, {counts[NO_INGLES]} en otro idioma, "
+              f"{counts[BAJA_CONFIANZA]} con baja confianza, {counts[SIN_LETRAS]} sin letras")
 
-# Guarda el archivo JSON modificado
-with open(output_filename, 'w', encoding='utf-8') as f:
-    json.dump(data, f, indent=4, ensure_ascii=False)
-
-# Imprime estadísticas de traducción
-print(f"Archivo '{output_filename}' actualizado correctamente con las traducciones.")
-print("Estadísticas de traducción:")
-for key, count in translation_counts.items():
-    print(f" - {key}: {count} traducciones realizadas")
-
-# Muestra el total de traducciones por clave
-total_traducciones = sum(translation_counts.values())
-print(f"\nTotal de traducciones realizadas: {total_traducciones}")
-print(f"Desglose por clave:")
-for key in TRANSLATABLE_KEYS:
-    print(f"{key}: {translation_counts[key]}")
+    # Muestra el total de traducciones por clave
+    total_traducciones = sum(translation_counts.values())
+    print(f"\nTotal de traducciones realizadas: {total_traducciones}")
+    print(f"Desglose por clave:")
+    for key in TRANSLATABLE_KEYS:
+        print(f"{key}: {translation_counts[key]}")
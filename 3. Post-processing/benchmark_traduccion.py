@@ -0,0 +1,55 @@
+import os
+import time
+import random
+import argparse
+import tempfile
+import pandas as pd
+
+from Translation import translate_text_if_english, translate_unique, model_name, device
+from memoria_traduccion import MemoriaTraduccion
+
+# Textos cortos con muchas repeticiones, como los head/relation/tail de las tripletas:
+# lugares del dataset y fragmentos de 1 a 3 palabras de los tweets
+def textos_de_prueba(n, semilla=42):
+    datos = pd.read_csv('../Dataset/nz_earthquake.csv', encoding="latin9", dtype=str)
+    generador = random.Random(semilla)
+    lugares = datos['location_text'].dropna().tolist()
+    palabras = [texto.split() for texto in datos['text'].dropna() if texto.split()]
+    textos = []
+    while len(textos) < n:
+        if generador.random() < 0.4:
+            textos.append(generador.choice(lugares))
+        else:
+            tweet = generador.choice(palabras)
+            inicio = generador.randrange(len(tweet))
+            textos.append(' '.join(tweet[inicio:inicio + generador.randint(1, 3)]))
+    return textos
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark de la traducción: bucle texto a texto frente a lotes únicos con memoria')
+    parser.add_argument('--textos', type=int, default=2000, help='Número de textos a traducir')
+    parser.add_argument('--lote', type=int, default=32, help='Textos por lote de generate')
+    args = parser.parse_args()
+
+    textos = textos_de_prueba(args.textos)
+    print(f"{len(textos)} textos ({len(set(textos))} distintos), modelo {model_name} en {device}")
+
+    start_time = time.time()
+    for text in textos:
+        translate_text_if_english(text)
+    elapsed_time = time.time() - start_time
+    print(f"Bucle actual (lote de 1): {len(textos)/elapsed_time:.2f} textos/s ({elapsed_time:.2f} s)")
+
+    start_time = time.time()
+    translate_unique(textos, batch_size=args.lote)
+    elapsed_time = time.time() - start_time
+    print(f"Únicos en lotes de {args.lote}: {len(textos)/elapsed_time:.2f} textos/s ({elapsed_time:.2f} s)")
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        memoria = MemoriaTraduccion(os.path.join(carpeta, 'memoria.sqlite'), modelo=model_name)
+        translate_unique(textos, memoria=memoria, batch_size=args.lote)
+        start_time = time.time()
+        translate_unique(textos, memoria=memoria, batch_size=args.lote)
+        elapsed_time = time.time() - start_time
+        print(f"Con la memoria de traducción ya llena: {len(textos)/elapsed_time:.2f} textos/s ({elapsed_time:.2f} s)")
+        memoria.cerrar()
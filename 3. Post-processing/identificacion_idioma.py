@@ -0,0 +1,75 @@
+import os
+import csv
+import argparse
+
+# Conjunto etiquetado (texto, idioma) para comprobar el identificador; sin idioma: nombres propios, números, fechas
+VERIFICACION = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'verificacion_idioma.csv')
+
+class IdentificadorIdioma:
+    """
+    Identificación del idioma de textos cortos, como los valores de las
+    tripletas, con el modelo preentrenado de n-gramas de lingua
+    (lingua-language-detector), limitado a los idiomas indicados. La
+    confianza es la que lingua asigna al idioma más probable entre ellos; los
+    textos con menos de min_letras letras (números, unidades) no tienen idioma.
+    """
+
+    def __init__(self, idiomas=('en', 'es'), min_letras=3):
+        from lingua import IsoCode639_1, Language, LanguageDetectorBuilder
+
+        self.min_letras = min_letras
+        lenguas = [Language.from_iso_code_639_1(getattr(IsoCode639_1, idioma.upper())) for idioma in idiomas]
+        self.detector = LanguageDetectorBuilder.from_languages(*lenguas).build()
+
+    def probabilidades(self, texto):
+        """Probabilidad de cada idioma para el texto ({} si lingua no lo asigna a ninguno)"""
+        valores = self.detector.compute_language_confidence_values(texto)
+        return {valor.language.iso_code_639_1.name.lower(): valor.value for valor in valores if valor.value > 0}
+
+    def detectar(self, texto):
+        """Devuelve (idioma, confianza), o (None, 0.0) si el texto no tiene suficientes letras"""
+        if sum(ch.isalpha() for ch in texto) < self.min_letras:
+            return None, 0.0
+        probabilidades = self.probabilidades(texto)
+        if not probabilidades:
+            return None, 0.0
+        idioma = max(probabilidades, key=probabilidades.get)
+        return idioma, probabilidades[idioma]
+
+def evaluar(identificador, filename=VERIFICACION, umbral=0.9):
+    """
+    Comprueba el identificador con el conjunto etiquetado: aciertos sobre los
+    textos con idioma, errores con confianza de al menos umbral (los que el
+    filtro de Translation.py daría por buenos) y textos sin idioma que
+    superarían el umbral como inglés.
+    """
+    with open(filename, 'r', encoding='utf-8', newline='') as f:
+        filas = [(fila['texto'], fila['idioma']) for fila in csv.DictReader(f)]
+    resultado = {'con_idioma': 0, 'aciertos': 0, 'errores_confiados': [], 'sin_idioma': 0, 'sin_idioma_como_ingles': []}
+    for texto, esperado in filas:
+        idioma, confianza = identificador.detectar(texto)
+        if esperado:
+            resultado['con_idioma'] += 1
+            resultado['aciertos'] += idioma == esperado
+            if idioma != esperado and confianza >= umbral:
+                resultado['errores_confiados'].append((texto, esperado, idioma, confianza))
+        else:
+            resultado['sin_idioma'] += 1
+            if idioma == 'en' and confianza >= umbral:
+                resultado['sin_idioma_como_ingles'].append((texto, confianza))
+    return resultado
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Comprueba el identificador de idioma con un conjunto etiquetado')
+    parser.add_argument('--verificacion', default=VERIFICACION, help='CSV con las columnas texto e idioma (vacío si no tiene idioma)')
+    parser.add_argument('--umbral', type=float, default=0.9, help='Confianza mínima con la que Translation.py traduce un texto')
+    args = parser.parse_args()
+
+    resultado = evaluar(IdentificadorIdioma(), args.verificacion, umbral=args.umbral)
+    print(f"Aciertos: {resultado['aciertos']} de {resultado['con_idioma']} textos con idioma")
+    print(f"Errores con confianza >= {args.umbral}: {len(resultado['errores_confiados'])}")
+    for texto, esperado, idioma, confianza in resultado['errores_confiados']:
+        print(f"  {texto!r}: {idioma} ({confianza:.2f}), debería ser {esperado}")
+    print(f"Textos sin idioma que se traducirían como inglés: {len(resultado['sin_idioma_como_ingles'])} de {resultado['sin_idioma']}")
+    for texto, confianza in resultado['sin_idioma_como_ingles']:
+        print(f"  {texto!r}: en ({confianza:.2f})")
@@ -0,0 +1,63 @@
+import json
+
+def iterar_json_array(filename, tamano_bloque=1 << 20, encoding='utf-8'):
+    """
+    Recorre los elementos de un archivo JSON cuyo nivel superior es un array,
+    leyendo bloques de tamano_bloque caracteres en lugar de cargar el archivo
+    entero con json.load.
+    """
+    decoder = json.JSONDecoder()
+    separadores = ' \t\r\n,'
+    with open(filename, 'r', encoding=encoding) as f:
+        buffer = f.read(tamano_bloque).lstrip()
+        while not buffer:
+            bloque = f.read(tamano_bloque)
+            if not bloque:
+                break
+            buffer = bloque.lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{filename} no contiene un array JSON")
+        posicion = 1
+        fin_archivo = False
+        while True:
+            # Se avanza con un índice en lugar de recortar el buffer tras cada elemento
+            while posicion < len(buffer) and buffer[posicion] in separadores:
+                posicion += 1
+            if posicion < len(buffer) and buffer[posicion] == ']':
+                return
+            try:
+                elemento, posicion_siguiente = decoder.raw_decode(buffer, posicion)
+                # El elemento solo está completo si detrás ya está la coma o el cierre del array: un número
+                # cortado por el final del bloque ('0.' y '25', '1e' y '5', '12' y '3') se leería sin el resto
+                siguiente = posicion_siguiente
+                while siguiente < len(buffer) and buffer[siguiente] in ' \t\r\n':
+                    siguiente += 1
+                if not fin_archivo and (siguiente == len(buffer) or buffer[siguiente] not in ',]'):
+                    raise json.JSONDecodeError('Elemento incompleto', buffer, posicion)
+            except json.JSONDecodeError:
+                if fin_archivo:
+                    raise
+                # El elemento está cortado al final del bloque: se descarta lo ya leído y se lee el siguiente
+                bloque = f.read(tamano_bloque)
+                fin_archivo = not bloque
+                buffer = buffer[posicion:] + bloque
+                posicion = 0
+                continue
+            yield elemento
+            posicion = posicion_siguiente
+
+class EscritorJsonArray:
+    """Escribe un array JSON elemento a elemento, con el mismo formato que json.dump(..., indent=4)"""
+
+    def __init__(self, output_filename, encoding='utf-8'):
+        self.f = open(output_filename, 'w', encoding=encoding)
+        self.vacio = True
+
+    def escribir(self, elemento):
+        contenido = json.dumps(elemento, ensure_ascii=False, indent=4).replace('\n', '\n    ')
+        self.f.write(('[\n    ' if self.vacio else ',\n    ') + contenido)
+        self.vacio = False
+
+    def cerrar(self):
+        self.f.write('[]' if self.vacio else '\n]')
+        self.f.close()
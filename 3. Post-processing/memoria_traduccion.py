@@ -0,0 +1,47 @@
+import sqlite3
+
+class MemoriaTraduccion:
+    """Memoria de traducción persistente en SQLite: cada texto distinto se traduce una sola vez por modelo"""
+
+    def __init__(self, ruta='memoria_traduccion.sqlite', modelo=''):
+        self.ruta = ruta
+        self.modelo = modelo
+        self.aciertos = 0
+        self.fallos = 0
+        self._conexion = sqlite3.connect(ruta)
+        self._conexion.execute('PRAGMA journal_mode=WAL')
+        self._conexion.execute(
+            'CREATE TABLE IF NOT EXISTS traducciones (modelo TEXT, origen TEXT, traduccion TEXT, PRIMARY KEY (modelo, origen))'
+        )
+        self._conexion.commit()
+
+    def obtener_varios(self, textos, tamano_consulta=500):
+        """Devuelve {texto: traducción} con los textos que ya están en la memoria"""
+        encontradas = {}
+        for inicio in range(0, len(textos), tamano_consulta):
+            lote = textos[inicio:inicio + tamano_consulta]
+            marcadores = ','.join('?' * len(lote))
+            filas = self._conexion.execute(
+                f'SELECT origen, traduccion FROM traducciones WHERE modelo = ? AND origen IN ({marcadores})',
+                [self.modelo, *lote]
+            )
+            encontradas.update(filas)
+        self.aciertos += len(encontradas)
+        self.fallos += len(textos) - len(encontradas)
+        return encontradas
+
+    def guardar_varios(self, pares):
+        """Guarda pares (texto, traducción) en una sola transacción"""
+        self._conexion.executemany(
+            'INSERT OR REPLACE INTO traducciones (modelo, origen, traduccion) VALUES (?, ?, ?)',
+            [(self.modelo, origen, traduccion) for origen, traduccion in pares]
+        )
+        self._conexion.commit()
+
+    def resumen(self):
+        total = self.aciertos + self.fallos
+        porcentaje = (self.aciertos / total) * 100 if total > 0 else 0
+        return f"Memoria de traducción: {self.aciertos} textos ya traducidos, {self.fallos} nuevos ({porcentaje:.2f}% de aciertos)"
+
+    def cerrar(self):
+        self._conexion.close()
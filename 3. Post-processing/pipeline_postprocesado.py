@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from parser_tripletas import resumen_diagnosticos
+from almacen_tripletas import AlmacenTripletas, es_almacen, leer_tripletas
+from lectura_json import iterar_json_array, EscritorJsonArray
+
+# Post-procesado en una sola pasada: las tripletas se leen en streaming, atraviesan por bloques
+# las etapas elegidas (en el orden indicado) y se escriben como JSONL. Cada etapa importa su
+# script (y carga sus modelos) solo si se usa. La memoria queda acotada por el bloque y por
+# las cachés de textos distintos de cada etapa.
+
+class EtapaAcortar:
+    """Minúsculas y acortado de los textos largos (Long.py)"""
+    nombre = 'acortar'
+
+    def __init__(self, args):
+        import Long
+        self.Long = Long
+        self.lote = args.lote_resumen
+        self.umbral = None if args.sin_extractivo else args.umbral_extractivo
+        self.conteo = {}
+        self.metricas = open(args.metricas, 'w', encoding='utf-8') if args.metricas else None
+
+    def procesar(self, bloque):
+        self.Long.lowercase_entries(bloque)
+        metricas = self.Long.process_entries_batched(bloque, self.Long.semantic_model, batch_size=self.lote, umbral_extractivo=self.umbral, conteo=self.conteo)
+        if self.metricas is not None:
+            self.metricas.writelines(json.dumps(m, ensure_ascii=False) + '\n' for m in metricas)
+
+    def resumen(self):
+        if self.metricas is not None:
+            self.metricas.close()
+        return f"{self.conteo.get('extractivo', 0)} textos acortados con el paso extractivo, {self.conteo.get('abstractivo', 0)} con t5-large"
+
+class EtapaTraducir:
+    """Traducción al español (Translation.py)"""
+    nombre = 'traducir'
+
+    def __init__(self, args):
+        import Translation
+        from identificacion_idioma import IdentificadorIdioma
+        from memoria_traduccion import MemoriaTraduccion
+        self.Translation = Translation
+        self.lote = args.lote_traduccion
+        self.umbral = args.umbral_idioma
+        self.identificador = None if args.sin_filtro_idioma else IdentificadorIdioma()
+        self.memoria = None if args.sin_memoria else MemoriaTraduccion(args.memoria, modelo=Translation.model_name)
+        self.translation_counts = {key: 0 for key in Translation.TRANSLATABLE_KEYS}
+        self.decision_counts = {key: {motivo: 0 for motivo in Translation.MOTIVOS} for key in Translation.TRANSLATABLE_KEYS}
+
+    def procesar(self, bloque):
+        self.Translation.traducir_entradas(bloque, memoria=self.memoria, batch_size=self.lote, identificador=self.identificador, umbral=self.umbral,
+                                           translation_counts=self.translation_counts, decision_counts=self.decision_counts)
+
+    def resumen(self):
+        lineas = [', '.join(f"{key}: {count} traducidos" for key, count in self.translation_counts.items())]
+        if self.identificador is not None:
+            omitidos = {key: sum(counts.values()) - counts[self.Translation.TRADUCIR] for key, counts in self.decision_counts.items()}
+            lineas.append('omitidos por el filtro de idioma: ' + ', '.join(f"{key}: {count}" for key, count in omitidos.items()))
+        if self.memoria is not None:
+            lineas.append(self.memoria.resumen())
+            self.memoria.cerrar()
+        return '; '.join(lineas)
+
+class EtapaLematizar:
+    """Lematización (Lemmatization.py)"""
+    nombre = 'lematizar'
+
+    def __init__(self, args):
+        import Lemmatization
+        self.Lemmatization = Lemmatization
+        self.lote = args.lote_lemas
+        self.procesos = args.procesos
+        self.lemmas = {}
+
+    def procesar(self, bloque):
+        self.Lemmatization.lematizar_entradas(bloque, self.lemmas, batch_size=self.lote, n_process=self.procesos)
+
+    def resumen(self):
+        return f"{len(self.lemmas)} textos distintos lematizados"
+
+ETAPAS = {etapa.nombre: etapa for etapa in (EtapaAcortar, EtapaTraducir, EtapaLematizar)}
+
+class PipelinePostprocesado:
+    """Ejecuta las etapas por bloques de tripletas y mide el tiempo de cada una"""
+
+    def __init__(self, etapas, tamano_bloque=5000, carpeta_depuracion=None):
+        self.etapas = etapas
+        self.tamano_bloque = tamano_bloque
+        self.tiempos = {etapa.nombre: 0.0 for etapa in etapas}
+        self.tiempos['escritura'] = 0.0
+        self.tripletas = 0
+        self.depuracion = None
+        if carpeta_depuracion:
+            # Archivos intermedios con el formato de los scripts separados, solo para depurar
+            os.makedirs(carpeta_depuracion, exist_ok=True)
+            self.depuracion = {etapa.nombre: EscritorJsonArray(os.path.join(carpeta_depuracion, f"{numero}_{etapa.nombre}.json"))
+                               for numero, etapa in enumerate(etapas, start=1)}
+
+    def _procesar_bloque(self, bloque, salida):
+        for etapa in self.etapas:
+            start_time = time.time()
+            etapa.procesar(bloque)
+            self.tiempos[etapa.nombre] += time.time() - start_time
+            if self.depuracion is not None:
+                for tripleta in bloque:
+                    self.depuracion[etapa.nombre].escribir(tripleta)
+
+        start_time = time.time()
+        if isinstance(salida, AlmacenTripletas):
+            salida.agregar_varias(bloque)
+        else:
+            salida.writelines(json.dumps(tripleta, ensure_ascii=False) + '\n' for tripleta in bloque)
+        self.tiempos['escritura'] += time.time() - start_time
+        self.tripletas += len(bloque)
+
+    def _ejecutar_bloques(self, tripletas, salida):
+        bloque = []
+        for tripleta in tripletas:
+            bloque.append(tripleta)
+            if len(bloque) >= self.tamano_bloque:
+                self._procesar_bloque(bloque, salida)
+                bloque = []
+        if bloque:
+            self._procesar_bloque(bloque, salida)
+
+    def ejecutar(self, tripletas, output_filename):
+        start_time = time.time()
+        if es_almacen(output_filename):
+            # Salida como almacén columnar (.parquet, .arrow) en lugar de JSONL
+            almacen = AlmacenTripletas()
+            self._ejecutar_bloques(tripletas, almacen)
+            inicio_guardado = time.time()
+            almacen.guardar(output_filename)
+            self.tiempos['escritura'] += time.time() - inicio_guardado
+        else:
+            with open(output_filename, 'w', encoding='utf-8') as salida:
+                self._ejecutar_bloques(tripletas, salida)
+        if self.depuracion is not None:
+            for writer in self.depuracion.values():
+                writer.cerrar()
+        total = time.time() - start_time
+        # Lo que no se pasa en las etapas ni escribiendo es lectura y parseo de la entrada
+        self.tiempos = {'lectura': total - sum(self.tiempos.values()), **self.tiempos}
+        return total
+
+    def reporte(self, total):
+        print(f"{self.tripletas} tripletas procesadas en {total:.2f} s")
+        for nombre, segundos in self.tiempos.items():
+            tripletas_por_segundo = self.tripletas / segundos if segundos > 0 else 0
+            print(f" - {nombre}: {segundos:.2f} s ({tripletas_por_segundo:.0f} tripletas/s)")
+        for etapa in self.etapas:
+            print(f" {etapa.nombre}: {etapa.resumen()}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Post-procesado de las tripletas en una sola pasada')
+    parser.add_argument('--entrada', required=True, help='CSV de la extracción, JSON con la lista de tripletas, JSONL o almacén de tripletas')
+    parser.add_argument('--formato', choices=['csv', 'json', 'jsonl', 'parquet', 'arrow'], default=None, help='Formato de la entrada (por defecto, según la extensión)')
+    parser.add_argument('--columna-tripletas', default='Tripletas', help='Columna del CSV con la salida del modelo')
+    parser.add_argument('--columna-id', default=None, help='Columna del CSV con el id del documento (por defecto, el índice)')
+    parser.add_argument('--salida', default='tripletas_postprocesadas.jsonl', help='Archivo JSONL de salida, o almacén de tripletas si termina en .parquet o .arrow')
+    parser.add_argument('--etapas', nargs='+', choices=list(ETAPAS), default=['acortar', 'traducir', 'lematizar'], help='Etapas a aplicar, en orden')
+    parser.add_argument('--bloque', type=int, default=5000, help='Tripletas por bloque')
+    parser.add_argument('--depuracion', default=None, help='Carpeta donde guardar la salida de cada etapa como JSON (solo para depurar)')
+    parser.add_argument('--metricas', default=None, help='JSONL con las similitudes del acortado, una línea por tripleta')
+    parser.add_argument('--lote-resumen', type=int, default=32, help='Textos por lote del resumidor')
+    parser.add_argument('--umbral-extractivo', type=float, default=0.8, help='Similitud mínima para aceptar el acortado extractivo')
+    parser.add_argument('--sin-extractivo', action='store_true', help='Resumir todos los textos largos con t5-large')
+    parser.add_argument('--lote-traduccion', type=int, default=32, help='Textos por lote del traductor')
+    parser.add_argument('--umbral-idioma', type=float, default=0.9, help='Confianza mínima de que un texto está en inglés para traducirlo')
+    parser.add_argument('--sin-filtro-idioma', action='store_true', help='Traducir todos los textos sin identificar su idioma')
+    parser.add_argument('--memoria', default='memoria_traduccion.sqlite', help='Archivo SQLite de la memoria de traducción')
+    parser.add_argument('--sin-memoria', action='store_true', help='No usar la memoria de traducción')
+    parser.add_argument('--lote-lemas', type=int, default=1000, help='Textos por lote de nlp.pipe')
+    parser.add_argument('--procesos', type=int, default=1, help='Procesos de nlp.pipe (n_process)')
+    args = parser.parse_args()
+
+    formato = args.formato or os.path.splitext(args.entrada)[1].lstrip('.').lower()
+    diagnosticos = []
+    if formato in ('csv', 'jsonl'):
+        tripletas = leer_tripletas(args.entrada, args.columna_tripletas, columna_id=args.columna_id, formato=formato, diagnosticos=diagnosticos)
+    elif formato in ('parquet', 'arrow', 'feather'):
+        tripletas = iter(AlmacenTripletas.cargar(args.entrada))
+    elif formato == 'json':
+        tripletas = (tripleta for tripleta in iterar_json_array(args.entrada) if isinstance(tripleta, dict))
+    else:
+        parser.error(f'Formato de entrada desconocido: {formato} (use --formato)')
+
+    etapas = [ETAPAS[nombre](args) for nombre in args.etapas]
+    pipeline = PipelinePostprocesado(etapas, tamano_bloque=args.bloque, carpeta_depuracion=args.depuracion)
+    total = pipeline.ejecutar(tripletas, args.salida)
+    pipeline.reporte(total)
+    if diagnosticos:
+        print(resumen_diagnosticos(diagnosticos))
+    print(f"Resultado guardado en {args.salida}")
@@ -1,9 +1,24 @@
 import pandas as pd
 import gc
-import ollama
 import json
 from tqdm import tqdm
 import time
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from backends_slm import crear_backend
+from parser_tripletas import parsear_tripletas
+from almacen_tripletas import AlmacenTripletas
+
+# Almacén con las tripletas ya tipadas (.parquet de Cleansing.py o de almacen_tripletas.py), con la fila del CSV
+# en id_documento; sin él se parsea la columna con la salida del modelo
+filename_almacen = None
+tripletas_por_documento = AlmacenTripletas.cargar(filename_almacen).por_documento() if filename_almacen else None
+
+# Servidor del verificador: 'ollama', 'openai' (API compatible local) o 'fake' (respuestas fijas, sin modelo).
+# Se elige con la variable de entorno BACKEND_SLM
+backend = crear_backend(os.environ.get('BACKEND_SLM', 'ollama'))
 
 # Función para convertir una tripleta en una oración o afirmación legible
 def convertir_tripleta_a_oracion(tripleta):
@@ -26,11 +41,11 @@ def convertir_tripleta_a_oracion(tripleta):
         return ""
 
 # Función para verificar si una afirmación está respaldada por la noticia
-def verificar_alucinacion(noticia, oracion):
+def verificar_alucinacion(noticia, oracion, backend=backend):
     try:
         prompt = f"Document:\n{noticia}\n\nAfirmación:\n{oracion}\n\n¿La afirmación está respaldada por el documento? Responde con Sí o No."
         # Llamada al modelo bespoke-minicheck
-        respuesta = ollama.chat(model="bespoke-minicheck", messages=[{"role": "system", "content": prompt}])
+        respuesta = backend.chat(model="bespoke-minicheck", messages=[{"role": "system", "content": prompt}])
         return 1 if 'No' in respuesta['message']['content'] else 0
     except Exception as e:
         print(f"Error al verificar la afirmación: {e}")
@@ -39,13 +54,14 @@ def verificar_alucinacion(noticia, oracion):
 # Función para procesar cada fila y calcular el porcentaje de alucinación por tripleta
 def procesar_fila(fila):
     noticia = fila['texto_completo']  # Asumiendo que el documento está en una columna llamada 'texto_completo'
-    json_afirmacion = str(fila['Tripletas'])  # Aseguramos que el valor sea tratado como string
-
-    try:
-        afirmaciones_json = json.loads(json_afirmacion)
-    except json.JSONDecodeError:
-        print("JSON inválido, omitiendo fila.")
-        return pd.Series([0, json.dumps([], ensure_ascii=False), 0])  # Si no se puede cargar el JSON, retornamos 0 y una lista vacía
+    if tripletas_por_documento is not None:
+        tripletas = tripletas_por_documento.get(fila.name, [])
+    else:
+        # Recuperar las tripletas válidas con el parser común, aunque la salida del modelo esté sucia o truncada
+        tripletas, diagnostico = parsear_tripletas(fila['Tripletas'])
+        if not tripletas and any(diagnostico.values()):
+            print(f"Sin tripletas válidas, omitiendo fila: {diagnostico}")
+    afirmaciones_json = [tripleta._asdict() for tripleta in tripletas]
 
     total_tripletas = len(afirmaciones_json)
     if total_tripletas == 0:
@@ -69,6 +85,18 @@ def procesar_fila(fila):
     porcentaje_alucinacion = (alucinaciones_tripletas / total_tripletas) * 100
     return pd.Series([porcentaje_alucinacion, json.dumps(detalles_tripletas, ensure_ascii=False), total_tripletas])  # Retornamos los detalles y el número de tripletas
 
+# Las filas con las tripletas copiadas de un casi duplicado (columna tripletas_de de NER_SLM.py --duplicados)
+# reutilizan la verificación del representante en lugar de volver a llamar al modelo
+verificaciones_representantes = {}
+
+def procesar_fila_deduplicada(fila):
+    representante = fila.get('tripletas_de')
+    if pd.isna(representante):
+        return procesar_fila(fila)
+    if representante not in verificaciones_representantes:
+        verificaciones_representantes[representante] = procesar_fila(fila)
+    return verificaciones_representantes[representante]
+
 # Cargar archivo localmente (modificar el nombre de archivo si es necesario)
 filename = 'C:/....csv'
 data = pd.read_csv(filename, encoding="latin9")
@@ -81,7 +109,7 @@ start_time = time.time()
 tqdm.pandas(desc="Procesando filas")
 
 # Aplicar la función con progreso
-data[['porcentaje_alucinacion', 'detalles_tripletas', 'total_tripletas']] = data.progress_apply(procesar_fila, axis=1)
+data[['porcentaje_alucinacion', 'detalles_tripletas', 'total_tripletas']] = data.progress_apply(procesar_fila_deduplicada, axis=1)
 
 # Calcular métricas generales
 promedio_porcentaje_alucinacion = data['porcentaje_alucinacion'].mean()
@@ -93,6 +121,8 @@ print(f"\nMétricas generales:")
 print(f"Porcentaje promedio de alucinación en todos los documentos: {promedio_porcentaje_alucinacion:.2f}%")
 print(f"Total de tripletas evaluadas: {total_tripletas_evaluadas}")
 print(f"Total de documentos procesados: {total_documentos}")
+if 'tripletas_de' in data:
+    print(f"Filas que reutilizaron la verificación de su representante: {data['tripletas_de'].notna().sum() - len(verificaciones_representantes)}")
 
 # Guardar el nuevo CSV con la columna de porcentaje de alucinación y detalles de tripletas
 data.to_csv('C:/.....csv', index=False, encoding="latin9")
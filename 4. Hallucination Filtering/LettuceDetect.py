@@ -3,9 +3,20 @@ import gc
 import json
 from tqdm import tqdm
 import time
+import os
+import sys
 from lettucedetect.models.inference import HallucinationDetector
 from transformers import BertModel, BertConfig  # Changed from ModernBert to Bert
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from parser_tripletas import parsear_tripletas
+from almacen_tripletas import AlmacenTripletas
+
+# Almacén con las tripletas ya tipadas (.parquet de Cleansing.py o de almacen_tripletas.py), con la fila del CSV
+# en id_documento; sin él se parsea la columna con la salida del modelo
+filename_almacen = None
+tripletas_por_documento = AlmacenTripletas.cargar(filename_almacen).por_documento() if filename_almacen else None
+
 # Initializing a BERT style configuration
 configuration = BertConfig()
 
@@ -63,13 +74,14 @@ def verificar_alucinacion(noticia, oracion):
 # Función para procesar cada fila y calcular el porcentaje de alucinación por tripleta
 def procesar_fila(fila):
     noticia = fila['text']  # Asumiendo que el documento está en una columna llamada 'texto_completo'
-    json_afirmacion = str(fila['TripletasLlama'])  # Aseguramos que el valor sea tratado como string
-
-    try:
-        afirmaciones_json = json.loads(json_afirmacion)
-    except json.JSONDecodeError:
-        print("JSON inválido, omitiendo fila.")
-        return pd.Series([0, json.dumps([], ensure_ascii=False), 0])  # Si no se puede cargar el JSON, retornamos 0 y una lista vacía
+    if tripletas_por_documento is not None:
+        tripletas = tripletas_por_documento.get(fila.name, [])
+    else:
+        # Recuperar las tripletas válidas con el parser común, aunque la salida del modelo esté sucia o truncada
+        tripletas, diagnostico = parsear_tripletas(fila['TripletasLlama'])
+        if not tripletas and any(diagnostico.values()):
+            print(f"Sin tripletas válidas, omitiendo fila: {diagnostico}")
+    afirmaciones_json = [tripleta._asdict() for tripleta in tripletas]
 
     total_tripletas = len(afirmaciones_json)
     if total_tripletas == 0:
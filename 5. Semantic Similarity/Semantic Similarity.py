@@ -5,22 +5,52 @@ from sentence_transformers import SentenceTransformer
 from sklearn.decomposition import PCA
 import matplotlib.pyplot as plt
 from collections import Counter
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from almacen_tripletas import AlmacenTripletas, es_almacen
 
 filename = "C:/.....json"
+output_filename = 'C:/...json'
 
-# Cargar los datos JSON
-with open(filename, 'r', encoding='utf-8') as f:
-    data = json.load(f)
+almacen = None
+if es_almacen(filename):
+    # Con un almacén de tripletas (.parquet, .arrow) se trabaja directamente sobre los textos distintos
+    almacen = AlmacenTripletas.cargar(filename)
+else:
+    # Cargar los datos JSON
+    with open(filename, 'r', encoding='utf-8') as f:
+        data = json.load(f)
 
 # Cargar el modelo de embeddings
 model = SentenceTransformer('all-mpnet-base-v2')
 
-# Obtener todos los "head_type"
-head_types = [entry.get('tail') for entry in data if isinstance(entry, dict) and entry.get('tail')]
+# Obtener los "head_type" distintos, en orden de aparición, con el número de veces que aparece cada uno
+if almacen is not None:
+    # Ordenados por su primera fila como tail (los ids del almacén siguen la primera aparición en cualquier columna)
+    tails = almacen.columna('tail')
+    ids, primeras, conteos = np.unique(tails[tails >= 0], return_index=True, return_counts=True)
+    orden = np.argsort(primeras)
+    repeticiones = {almacen.cadenas[i]: n for i, n in zip(ids[orden].tolist(), conteos[orden].tolist()) if almacen.cadenas[i]}
+else:
+    repeticiones = Counter(entry.get('tail') for entry in data if isinstance(entry, dict) and entry.get('tail'))
+head_types = list(repeticiones)
 
 # Vectorizar los "head_type"
 head_type_embeddings = model.encode(head_types)
 
+# Mediana de los valores repetidos cada uno tantas veces como su peso (entero), igual que np.median
+# sobre la lista expandida, sin construirla
+def mediana_ponderada(valores, pesos):
+    orden = np.argsort(valores)
+    valores = valores[orden]
+    acumulado = np.cumsum(pesos[orden])
+    total = acumulado[-1]
+    bajo = valores[np.searchsorted(acumulado, (total - 1) // 2, side='right')]
+    alto = valores[np.searchsorted(acumulado, total // 2, side='right')]
+    return (bajo + alto) / 2
+
 # Función para visualizar embeddings
 def visualizar_embeddings(embeddings, labels, title):
     pca = PCA(n_components=2)
@@ -42,10 +72,15 @@ print(f"Cantidad de tail únicos antes de la unificación: {len(unique_head_type
 # Calcular la matriz de similitud coseno
 similarity_matrix = cosine_similarity(head_type_embeddings)
 
-# Obtener estadísticas de similitud coseno
-similarities = similarity_matrix[np.triu_indices(len(head_types), k=1)]  # Excluir diagonal
-print(f"Media de similitudes coseno antes de la unificación: {np.mean(similarities):.4f}")
-print(f"Mediana de similitudes coseno antes de la unificación: {np.median(similarities):.4f}")
+# Obtener estadísticas de similitud coseno sobre todos los pares de apariciones (con el mismo resultado desde
+# un JSON o desde un almacén): el par de textos distintos (i, j) cuenta repeticiones[i] * repeticiones[j] veces
+# y cada texto consigo mismo, tantas veces como pares forman sus repeticiones
+conteos = np.array([repeticiones[head_type] for head_type in head_types], dtype=np.int64)
+filas, columnas = np.triu_indices(len(head_types), k=0)
+pesos = np.where(filas == columnas, conteos[filas] * (conteos[filas] - 1) // 2, conteos[filas] * conteos[columnas])
+similarities = similarity_matrix[filas, columnas]
+print(f"Media de similitudes coseno antes de la unificación: {np.average(similarities, weights=pesos):.4f}")
+print(f"Mediana de similitudes coseno antes de la unificación: {mediana_ponderada(similarities, pesos):.4f}")
 
 # Unificación de palabras semánticamente similares con umbral 0.9
 similarity_threshold = 0.9
@@ -60,15 +95,20 @@ for i, head_type in enumerate(head_types):
         for word in similar_words:
             unified_map[word] = representative
 
-# Aplicar la unificación en el JSON
-data_unified = data.copy()
-for entry in data_unified:
-    if isinstance(entry, dict) and entry.get('tail'):
-        entry['tail'] = unified_map[entry['tail']]
-
-# Guardar el JSON modificado
-with open('C:/...json', 'w', encoding='utf-8') as f:
-    json.dump(data_unified, f, ensure_ascii=False, indent=4)
+if almacen is not None:
+    # Aplicar la unificación a los textos distintos y guardar el almacén
+    almacen.aplicar(lambda tails: [unified_map.get(tail, tail) for tail in tails], ['tail'])
+    almacen.guardar(output_filename)
+else:
+    # Aplicar la unificación en el JSON
+    data_unified = data.copy()
+    for entry in data_unified:
+        if isinstance(entry, dict) and entry.get('tail'):
+            entry['tail'] = unified_map[entry['tail']]
+
+    # Guardar el JSON modificado
+    with open(output_filename, 'w', encoding='utf-8') as f:
+        json.dump(data_unified, f, ensure_ascii=False, indent=4)
 
 # Métricas después de la unificación
 unified_head_types = set(unified_map.values())
@@ -1,5 +1,10 @@
 import json
 import requests
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from almacen_tripletas import AlmacenTripletas, es_almacen
 
 # Contadores de métricas
 contador_encontradas = 0
@@ -36,6 +41,19 @@ def procesar_chunk(chunk):
                 elemento[uri_clave] = uri
     return chunk
 
+# Procesar un almacén de tripletas: cada texto distinto se busca una sola vez, aunque aparezca
+# en varias claves, y su URI se difunde a todas las filas en la columna {clave}_uri
+def procesar_almacen(almacen):
+    uris = {}
+    def uris_de(valores):
+        for valor in valores:
+            if valor and valor not in uris:
+                uris[valor] = buscar_wikidata(valor) or generar_uri(valor)
+        return [uris.get(valor) for valor in valores]
+    for clave in ["head", "relation", "tail", "head_type", "tail_type"]:
+        almacen.derivar(f"{clave}_uri", clave, uris_de)
+    return almacen
+
 # Cargar JSON en chunks
 def cargar_json_en_chunks(filename, chunk_size=100):
     with open(filename, 'r', encoding='utf-8') as f:
@@ -53,8 +71,11 @@ if __name__ == "__main__":
     filename = "C:/Users/LUIS VILCHES/Desktop/KG LLM y SML2/h_Embeddings/tripletas_gemma_lemma.json"
     json_actualizado = []
     
-    for chunk in cargar_json_en_chunks(filename):
-        json_actualizado.extend(procesar_chunk(chunk))
+    if es_almacen(filename):
+        json_actualizado = list(procesar_almacen(AlmacenTripletas.cargar(filename)))
+    else:
+        for chunk in cargar_json_en_chunks(filename):
+            json_actualizado.extend(procesar_chunk(chunk))
     
     guardar_json(json_actualizado)
     
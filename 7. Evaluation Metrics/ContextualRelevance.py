@@ -2,11 +2,18 @@ import pandas as pd
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
-import json
-import ast
+import os
+import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from parser_tripletas import parsear_tripletas, resumen_diagnosticos
+from almacen_tripletas import AlmacenTripletas, ID_DOCUMENTO, es_almacen
 
-df = pd.read_csv("C:/Users/LUIS VILCHES/Desktop/tripletas_respaldadas_mixtral_ner.csv", encoding="latin9")
+# CSV con las columnas texto_completo y tripletas_respaldadas
+filename = "C:/Users/LUIS VILCHES/Desktop/tripletas_respaldadas_mixtral_ner.csv"
+# De dónde salen las tripletas: el mismo CSV, o un almacén (.parquet, .arrow) construido a partir de él con
+# almacen_tripletas.py --columna-tripletas tripletas_respaldadas (id_documento es la fila del CSV)
+filename_tripletas = filename
 
 
 class ContextualRelevanceCalculator:
@@ -58,25 +65,14 @@ class ContextualRelevanceCalculator:
 
     def parse_tripletas(self, tripletas_str):
         """
-        Parsea diferentes formatos de tripletas
+        Parsea las tripletas con el parser común (JSON, literales de Python,
+        texto alrededor o salida truncada)
 
         :param tripletas_str: Cadena de tripletas
         :return: Lista de tripletas
         """
-        # Manejar caso de cadena vacía o None
-        if not tripletas_str or pd.isna(tripletas_str):
-            return []
-
-        try:
-            # Intentar parsear como JSON
-            return json.loads(tripletas_str.replace("'", '"'))
-        except (json.JSONDecodeError, TypeError):
-            try:
-                # Intentar parsear como literal de Python
-                return ast.literal_eval(tripletas_str)
-            except (ValueError, SyntaxError):
-                print(f"No se pudo parsear: {tripletas_str}")
-                return []
+        tripletas, _ = parsear_tripletas(tripletas_str)
+        return [tripleta._asdict() for tripleta in tripletas]
 
     def procesar_dataframe(self, df):
         """
@@ -85,8 +81,11 @@ class ContextualRelevanceCalculator:
         :param df: DataFrame con columnas 'texto_completo' y 'tripletas_respaldadas'
         :return: DataFrame con columnas adicionales de relevancia
         """
-        # Convertir columna de tripletas a lista de diccionarios
-        df['tripletas_parsed'] = df['tripletas_respaldadas'].apply(self.parse_tripletas)
+        # Convertir columna de tripletas a lista de diccionarios, guardando el diagnóstico de parseo de cada fila
+        parseado = [parsear_tripletas(tripletas_str) for tripletas_str in df['tripletas_respaldadas']]
+        df['tripletas_parsed'] = [[tripleta._asdict() for tripleta in tripletas] for tripletas, _ in parseado]
+        df['diagnostico_parseo'] = [diagnostico for _, diagnostico in parseado]
+        print(resumen_diagnosticos(df['diagnostico_parseo']))
 
         # Calcular relevancia para cada fila
         df['relevancia_contextual'] = df.apply(
@@ -104,17 +103,52 @@ class ContextualRelevanceCalculator:
 
         return df
 
+    def procesar_almacen(self, almacen, textos_documentos):
+        """
+        Calcula la relevancia contextual sobre un almacén de tripletas: cada
+        texto de tripleta distinto y cada documento se codifican una sola vez
+
+        :param almacen: AlmacenTripletas con la columna de documento
+        :param textos_documentos: Diccionario {id_documento: texto completo}
+        :return: DataFrame con una fila por documento y las columnas de relevancia
+        """
+        documentos = almacen.columna(ID_DOCUMENTO)
+        filas = np.column_stack([almacen.columna(clave) for clave in ('head', 'relation', 'tail')])
+        distintas, inversa = np.unique(filas, axis=0, return_inverse=True)
+        textos_tripletas = [' '.join(almacen.cadenas[i] if i >= 0 else '' for i in fila) for fila in distintas.tolist()]
+
+        codigos = [codigo for codigo in np.unique(documentos[documentos >= 0]).tolist() if almacen.documentos[codigo] in textos_documentos]
+        if not codigos:
+            return pd.DataFrame(columns=['id_documento', 'relevancia_contextual', 'relevancia_promedio'])
+        embeddings_tripletas = self.embedding_model.encode(textos_tripletas)
+        embeddings_documentos = self.embedding_model.encode([textos_documentos[almacen.documentos[codigo]] for codigo in codigos])
+
+        relevancias = []
+        for codigo, embedding_texto in zip(codigos, embeddings_documentos):
+            indices = inversa.reshape(-1)[documentos == codigo]
+            relevancias.append(cosine_similarity([embedding_texto], embeddings_tripletas[indices])[0].tolist())
+
+        df = pd.DataFrame({'id_documento': [almacen.documentos[codigo] for codigo in codigos], 'relevancia_contextual': relevancias})
+        df['relevancia_promedio'] = df['relevancia_contextual'].apply(lambda x: np.mean(x) if x else 0)
+        return df
+
 # Ejemplo de uso
 if __name__ == '__main__':
 
-    # Cargar datos
-    df = pd.read_csv("C:/Users/LUIS VILCHES/Desktop/tripletas_respaldadas_mixtral_ner.csv", encoding="latin9")
-
     # Inicializar calculador
     calculador = ContextualRelevanceCalculator()
 
-    # Procesar dataframe
-    df_con_relevancia = calculador.procesar_dataframe(df)
+    if es_almacen(filename_tripletas):
+        # Del CSV solo hacen falta los textos; las tripletas ya están tipadas en el almacén
+        textos = pd.read_csv(filename, encoding="latin9", usecols=['texto_completo'])['texto_completo']
+        almacen = AlmacenTripletas.cargar(filename_tripletas, columnas=('head', 'relation', 'tail'))
+        df_con_relevancia = calculador.procesar_almacen(almacen, dict(zip(textos.index, textos)))
+    else:
+        # Cargar datos
+        df = pd.read_csv(filename, encoding="latin9")
+
+        # Procesar dataframe
+        df_con_relevancia = calculador.procesar_dataframe(df)
 
     # Guardar resultados
     #df_con_relevancia.to_csv('desastres_naturales_con_relevancia.csv', index=False)
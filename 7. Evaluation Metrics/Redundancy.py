@@ -1,12 +1,18 @@
 import pandas as pd
+import numpy as np
 import json
-import ast
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from parser_tripletas import CLAVES, parsear_tripletas, resumen_diagnosticos
+from almacen_tripletas import AlmacenTripletas, ID_DOCUMENTO, es_almacen
 from collections import Counter
 
+# CSV con la columna tripletas_respaldadas, o un almacén de tripletas (.parquet, .arrow) construido a partir de él
+# con almacen_tripletas.py --columna-tripletas tripletas_respaldadas
 filename = "C:/Users/LUIS VILCHES/Desktop/tripletas_respaldadas_mixtral_ner.csv"
 
-df = pd.read_csv(filename, encoding="latin9")
-
 
 class RedundanciaTripletas:
     def __init__(self):
@@ -17,25 +23,14 @@ class RedundanciaTripletas:
 
     def parse_tripletas(self, tripletas_str):
         """
-        Parsea diferentes formatos de tripletas
+        Parsea las tripletas con el parser común (JSON, literales de Python,
+        texto alrededor o salida truncada)
 
         :param tripletas_str: Cadena de tripletas
         :return: Lista de tripletas
         """
-        # Manejar caso de cadena vacía o None
-        if not tripletas_str or pd.isna(tripletas_str):
-            return []
-
-        try:
-            # Intentar parsear como JSON
-            return json.loads(tripletas_str.replace("'", '"'))
-        except (json.JSONDecodeError, TypeError):
-            try:
-                # Intentar parsear como literal de Python
-                return ast.literal_eval(tripletas_str)
-            except (ValueError, SyntaxError):
-                print(f"No se pudo parsear: {tripletas_str}")
-                return []
+        tripletas, _ = parsear_tripletas(tripletas_str)
+        return [tripleta._asdict() for tripleta in tripletas]
 
     def tripleta_a_tupla_hashable(self, tripleta):
         """
@@ -115,8 +110,11 @@ class RedundanciaTripletas:
         :param df: DataFrame con columna 'tripletas_respaldadas'
         :return: DataFrame con columnas de redundancia
         """
-        # Convertir columna de tripletas a lista de diccionarios
-        df['tripletas_parsed'] = df['tripletas_respaldadas'].apply(self.parse_tripletas)
+        # Convertir columna de tripletas a lista de diccionarios, guardando el diagnóstico de parseo de cada fila
+        parseado = [parsear_tripletas(tripletas_str) for tripletas_str in df['tripletas_respaldadas']]
+        df['tripletas_parsed'] = [[tripleta._asdict() for tripleta in tripletas] for tripletas, _ in parseado]
+        df['diagnostico_parseo'] = [diagnostico for _, diagnostico in parseado]
+        print(resumen_diagnosticos(df['diagnostico_parseo']))
 
         # Calcular redundancia para cada fila
         df['redundancia'] = df['tripletas_parsed'].apply(self.calcular_redundancia)
@@ -130,16 +128,51 @@ class RedundanciaTripletas:
 
         return df
 
+    def procesar_almacen(self, almacen):
+        """
+        Calcula la redundancia por documento sobre un almacén de tripletas,
+        comparando ids internados en lugar de diccionarios
+
+        :param almacen: AlmacenTripletas con la columna de documento
+        :return: DataFrame con una fila por documento y las columnas de redundancia
+        """
+        documentos = almacen.columna(ID_DOCUMENTO)
+        filas = np.column_stack([documentos] + [almacen.columna(clave) for clave in CLAVES])
+        distintas, conteos = np.unique(filas, axis=0, return_counts=True)
+
+        totales = np.bincount(documentos[documentos >= 0], minlength=len(almacen.documentos))
+        codigos = np.flatnonzero(totales)
+        unicas = np.bincount(distintas[:, 0][distintas[:, 0] >= 0], minlength=len(almacen.documentos))
+        tripletas_repetidas = {codigo: {} for codigo in codigos.tolist()}
+        for fila, count in zip(distintas[conteos > 1].tolist(), conteos[conteos > 1].tolist()):
+            if fila[0] >= 0:
+                tripleta_dict = {clave: almacen.cadenas[i] for clave, i in sorted(zip(CLAVES, fila[1:])) if i >= 0}
+                tripletas_repetidas[fila[0]][json.dumps(tripleta_dict)] = count
+
+        df = pd.DataFrame({
+            'id_documento': [almacen.documentos[codigo] for codigo in codigos.tolist()],
+            'total_tripletas': totales[codigos],
+            'tripletas_unicas': unicas[codigos],
+        })
+        df['redundancia_ratio'] = (df['total_tripletas'] - df['tripletas_unicas']) / df['total_tripletas']
+        df['redundancia_porcentaje'] = df['redundancia_ratio'] * 100
+        df['tripletas_repetidas'] = [tripletas_repetidas[codigo] for codigo in codigos.tolist()]
+        return df
+
 # Ejemplo de uso
 if __name__ == '__main__':
-    # Cargar datos
-    df = pd.read_csv(filename, encoding="latin9")
-
     # Inicializar analizador de redundancia
     analizador = RedundanciaTripletas()
 
-    # Procesar dataframe
-    df_con_redundancia = analizador.procesar_dataframe(df)
+    if es_almacen(filename):
+        # Las tripletas ya están tipadas: una fila por documento con tripletas, sin parsear texto
+        df_con_redundancia = analizador.procesar_almacen(AlmacenTripletas.cargar(filename, columnas=CLAVES))
+    else:
+        # Cargar datos
+        df = pd.read_csv(filename, encoding="latin9")
+
+        # Procesar dataframe
+        df_con_redundancia = analizador.procesar_dataframe(df)
 
     # Guardar resultados
     #df_con_redundancia.to_csv('desastres_naturales_con_redundancia.csv', index=False)
@@ -0,0 +1,300 @@
+import os
+import json
+import argparse
+import numpy as np
+
+from parser_tripletas import CLAVES, Tripleta, parsear_tripletas
+
+# Extensiones de los archivos del almacén: Parquet (compacto) o Arrow IPC (sin comprimir, más rápido de leer)
+EXTENSIONES = ('.parquet', '.arrow', '.feather')
+ID_DOCUMENTO = 'id_documento'
+
+def es_almacen(filename):
+    return filename.lower().endswith(EXTENSIONES)
+
+class AlmacenTripletas:
+    """
+    Almacén columnar de tripletas con cadenas internadas.
+
+    Cada texto distinto se guarda una sola vez en cadenas; las tripletas son
+    columnas int32 con el id de su texto (-1 si falta el valor): las cinco
+    claves, las columnas derivadas que se añadan y el documento de origen
+    (id en documentos). Las operaciones sobre textos se hacen una vez por
+    texto distinto y el resultado se difunde a todas sus filas.
+    """
+
+    def __init__(self, columnas=CLAVES):
+        self.cadenas = []
+        self._ids = {}
+        self.documentos = []
+        self._ids_documentos = {}
+        self._n = 0
+        self._datos = {nombre: np.empty(1024, dtype=np.int32) for nombre in columnas}
+        self._datos[ID_DOCUMENTO] = np.empty(1024, dtype=np.int32)
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def columnas(self):
+        return [nombre for nombre in self._datos if nombre != ID_DOCUMENTO]
+
+    def internar(self, texto):
+        """Id del texto en el diccionario de cadenas, añadiéndolo si es nuevo (-1 para None)"""
+        if texto is None:
+            return -1
+        if not isinstance(texto, str):
+            texto = str(texto)
+        id_texto = self._ids.get(texto)
+        if id_texto is None:
+            id_texto = self._ids[texto] = len(self.cadenas)
+            self.cadenas.append(texto)
+        return id_texto
+
+    def _internar_documento(self, id_documento):
+        if id_documento is None:
+            return -1
+        id_interno = self._ids_documentos.get(id_documento)
+        if id_interno is None:
+            id_interno = self._ids_documentos[id_documento] = len(self.documentos)
+            self.documentos.append(id_documento)
+        return id_interno
+
+    def _reservar(self, n):
+        capacidad = len(self._datos[ID_DOCUMENTO])
+        if n > capacidad:
+            capacidad = max(n, 2 * capacidad)
+            for nombre, datos in self._datos.items():
+                nuevos = np.empty(capacidad, dtype=np.int32)
+                nuevos[:self._n] = datos[:self._n]
+                self._datos[nombre] = nuevos
+
+    def agregar(self, tripleta, id_documento=None):
+        """Añade una tripleta (diccionario o Tripleta); el documento sale de id_documento o de la propia tripleta"""
+        if hasattr(tripleta, '_asdict'):
+            tripleta = tripleta._asdict()
+        if id_documento is None:
+            id_documento = tripleta.get(ID_DOCUMENTO)
+        self._reservar(self._n + 1)
+        for nombre, datos in self._datos.items():
+            if nombre != ID_DOCUMENTO:
+                datos[self._n] = self.internar(tripleta.get(nombre))
+        self._datos[ID_DOCUMENTO][self._n] = self._internar_documento(id_documento)
+        self._n += 1
+
+    def agregar_varias(self, tripletas, id_documento=None):
+        for tripleta in tripletas:
+            self.agregar(tripleta, id_documento=id_documento)
+
+    @classmethod
+    def desde_tripletas(cls, tripletas):
+        almacen = cls()
+        almacen.agregar_varias(tripleta for tripleta in tripletas if isinstance(tripleta, dict) or hasattr(tripleta, '_asdict'))
+        return almacen
+
+    def columna(self, nombre):
+        """Ids de la columna (vista sobre los datos del almacén)"""
+        return self._datos[nombre][:self._n]
+
+    def textos(self, nombre):
+        return [self.cadenas[i] if i >= 0 else None for i in self.columna(nombre).tolist()]
+
+    def __iter__(self):
+        """Cada fila como diccionario, sin los valores que faltan"""
+        columnas = {nombre: self.columna(nombre).tolist() for nombre in self._datos}
+        for fila in range(self._n):
+            tripleta = {nombre: self.cadenas[ids[fila]] for nombre, ids in columnas.items() if nombre != ID_DOCUMENTO and ids[fila] >= 0}
+            if columnas[ID_DOCUMENTO][fila] >= 0:
+                tripleta[ID_DOCUMENTO] = self.documentos[columnas[ID_DOCUMENTO][fila]]
+            yield tripleta
+
+    def por_documento(self):
+        """{id_documento: [Tripleta]} con las tripletas de cada documento en su orden, para leerlas sin volver a parsear"""
+        cadenas = self.cadenas + [None]  # El id -1 (valor que falta) indexa el último elemento
+        columnas = [[cadenas[i] for i in self.columna(clave).tolist()] for clave in CLAVES]
+        documentos = {}
+        for id_documento, valores in zip(self.columna(ID_DOCUMENTO).tolist(), zip(*columnas)):
+            documento = self.documentos[id_documento] if id_documento >= 0 else None
+            documentos.setdefault(documento, []).append(Tripleta(*valores))
+        return documentos
+
+    def unicos(self, nombres):
+        """(ids, textos) de los textos distintos que aparecen en las columnas indicadas"""
+        ids = np.unique(np.concatenate([self.columna(nombre) for nombre in nombres]))
+        ids = ids[ids >= 0]
+        return ids, [self.cadenas[i] for i in ids.tolist()]
+
+    def frecuencias(self, nombre):
+        """{texto: número de filas} de una columna"""
+        ids = self.columna(nombre)
+        conteo = np.bincount(ids[ids >= 0], minlength=len(self.cadenas))
+        return {self.cadenas[i]: int(conteo[i]) for i in np.flatnonzero(conteo).tolist()}
+
+    def _mapa(self, ids, resultados):
+        # Tabla id antiguo -> id nuevo, para aplicarla de una vez a columnas enteras
+        nuevos = np.array([self.internar(resultado) for resultado in resultados], dtype=np.int32)
+        mapa = np.full(len(self.cadenas), -1, dtype=np.int32)
+        mapa[ids] = nuevos
+        return mapa
+
+    def _difundir(self, mapa, destino, origen):
+        ids_origen = self.columna(origen)
+        validos = ids_origen >= 0
+        columna = self.columna(destino)
+        columna[validos] = mapa[ids_origen[validos]]
+        columna[~validos] = -1
+
+    def aplicar(self, funcion, nombres):
+        """
+        Transforma los textos de las columnas: funcion recibe la lista de textos
+        distintos y devuelve sus resultados en el mismo orden. Devuelve {columna:
+        filas que cambiaron}.
+        """
+        ids, textos = self.unicos(nombres)
+        mapa = self._mapa(ids, funcion(textos) if textos else [])
+        cambios = {}
+        for nombre in nombres:
+            anteriores = self.columna(nombre).copy()
+            self._difundir(mapa, nombre, nombre)
+            cambios[nombre] = int(np.count_nonzero(anteriores != self.columna(nombre)))
+        return cambios
+
+    def derivar(self, nombre, origen, funcion):
+        """Añade la columna nombre con el resultado de funcion sobre los textos distintos de la columna origen"""
+        self._datos[nombre] = np.full(len(self._datos[ID_DOCUMENTO]), -1, dtype=np.int32)
+        ids, textos = self.unicos([origen])
+        self._difundir(self._mapa(ids, funcion(textos) if textos else []), nombre, origen)
+
+    def compactar(self):
+        """Quita del diccionario las cadenas que ya no usa ninguna fila (por ejemplo, tras aplicar)"""
+        ids, textos = self.unicos(list(self._datos.keys() - {ID_DOCUMENTO}))
+        mapa = np.full(len(self.cadenas), -1, dtype=np.int32)
+        mapa[ids] = np.arange(len(ids), dtype=np.int32)
+        for nombre in self.columnas:
+            columna = self.columna(nombre)
+            validos = columna >= 0
+            columna[validos] = mapa[columna[validos]]
+        self.cadenas = textos
+        self._ids = {texto: i for i, texto in enumerate(textos)}
+
+    def guardar(self, ruta):
+        """Guarda el almacén como Parquet o Arrow IPC (según la extensión) con columnas de diccionario"""
+        import pyarrow as pa
+
+        self.compactar()
+        diccionario = pa.array(self.cadenas, type=pa.string())
+        try:
+            documentos = pa.array(self.documentos)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            documentos = pa.array([str(documento) for documento in self.documentos], type=pa.string())
+
+        arrays = []
+        for nombre in self._datos:
+            ids = self.columna(nombre)
+            indices = pa.array(ids, type=pa.int32(), mask=ids < 0)
+            arrays.append(pa.DictionaryArray.from_arrays(indices, documentos if nombre == ID_DOCUMENTO else diccionario))
+        tabla = pa.Table.from_arrays(arrays, names=list(self._datos))
+
+        if ruta.lower().endswith('.parquet'):
+            import pyarrow.parquet as pq
+            pq.write_table(tabla, ruta)
+        else:
+            with pa.OSFile(ruta, 'wb') as destino, pa.ipc.new_file(destino, tabla.schema) as writer:
+                writer.write_table(tabla)
+
+    @classmethod
+    def cargar(cls, ruta, columnas=None):
+        """
+        Carga un almacén guardado, leyendo solo las columnas indicadas (más el
+        documento). Los índices se copian a arrays numpy y las cadenas se
+        internan de nuevo, así que el almacén cargado ocupa en memoria lo mismo
+        que uno construido en memoria.
+        """
+        import pyarrow as pa
+
+        if columnas is not None:
+            columnas = list(dict.fromkeys(list(columnas) + [ID_DOCUMENTO]))
+        if ruta.lower().endswith('.parquet'):
+            import pyarrow.parquet as pq
+            return cls._desde_tabla(pq.read_table(ruta, columns=columnas))
+        with pa.memory_map(ruta, 'r') as fuente:
+            tabla = pa.ipc.open_file(fuente).read_all()
+            if columnas is not None:
+                tabla = tabla.select([nombre for nombre in columnas if nombre in tabla.column_names])
+            return cls._desde_tabla(tabla)
+
+    @classmethod
+    def _desde_tabla(cls, tabla):
+        import pyarrow as pa
+
+        tabla = tabla.unify_dictionaries()
+        almacen = cls(columnas=[nombre for nombre in tabla.column_names if nombre != ID_DOCUMENTO])
+        almacen._reservar(tabla.num_rows)
+        almacen._n = tabla.num_rows
+        diccionario, mapa_textos = None, None
+        for nombre in tabla.column_names if tabla.num_rows else []:
+            columna = tabla.column(nombre)
+            if not pa.types.is_dictionary(columna.type):
+                columna = columna.dictionary_encode()
+            columna = columna.combine_chunks()
+            # Se internan los valores distintos del diccionario de Arrow y los índices se traducen de una vez;
+            # las columnas de texto guardadas por guardar comparten diccionario y reutilizan la traducción
+            if nombre == ID_DOCUMENTO:
+                mapa = np.array([almacen._internar_documento(valor) for valor in columna.dictionary.to_pylist()] + [-1], dtype=np.int32)
+            else:
+                if diccionario is None or not columna.dictionary.equals(diccionario):
+                    diccionario = columna.dictionary
+                    mapa_textos = np.array([almacen.internar(valor) for valor in columna.dictionary.to_pylist()] + [-1], dtype=np.int32)
+                mapa = mapa_textos
+            indices = columna.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+            almacen._datos[nombre][:almacen._n] = mapa[indices]
+        if ID_DOCUMENTO not in tabla.column_names:
+            almacen._datos[ID_DOCUMENTO][:almacen._n] = -1
+        return almacen
+
+    def resumen(self):
+        celdas = self._n * len(self.columnas)
+        return f"{self._n} tripletas de {len(self.documentos)} documentos; {len(self.cadenas)} textos distintos para {celdas} celdas"
+
+def leer_tripletas(filename, columna_tripletas='Tripletas', columna_id=None, encoding='latin9', formato=None, diagnosticos=None):
+    """
+    Tripletas de un JSON (lista), un JSONL o un CSV con la salida del modelo;
+    el formato se deduce de la extensión si no se indica. Las del CSV se
+    recuperan con el parser común y llevan en id_documento el documento del
+    que salen; si se pasa la lista diagnosticos, se añade el diagnóstico de
+    parseo de cada fila.
+    """
+    formato = formato or os.path.splitext(filename)[1].lstrip('.').lower()
+    if formato == 'csv':
+        import pandas as pd
+        for chunk in pd.read_csv(filename, encoding=encoding, chunksize=1000):
+            ids = chunk[columna_id].tolist() if columna_id else chunk.index.tolist()
+            for id_documento, text in zip(ids, chunk[columna_tripletas]):
+                tripletas, diagnostico = parsear_tripletas(text)
+                if diagnosticos is not None:
+                    diagnosticos.append(diagnostico)
+                for tripleta in tripletas:
+                    yield {**tripleta._asdict(), ID_DOCUMENTO: id_documento}
+    elif formato == 'jsonl':
+        with open(filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(filename, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convierte tripletas (JSON, JSONL o CSV) en un almacén columnar')
+    parser.add_argument('--entrada', required=True)
+    parser.add_argument('--salida', required=True, help='Archivo .parquet o .arrow')
+    parser.add_argument('--columna-tripletas', default='Tripletas', help='Columna del CSV con la salida del modelo')
+    parser.add_argument('--columna-id', default=None, help='Columna del CSV con el id del documento (por defecto, el índice)')
+    args = parser.parse_args()
+
+    if not es_almacen(args.salida):
+        parser.error(f'La salida debe terminar en {", ".join(EXTENSIONES)}')
+    almacen = AlmacenTripletas.desde_tripletas(leer_tripletas(args.entrada, args.columna_tripletas, args.columna_id))
+    almacen.guardar(args.salida)
+    print(almacen.resumen())
+    print(f"Almacén guardado en {args.salida}")
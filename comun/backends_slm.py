@@ -0,0 +1,164 @@
+import re
+import json
+import time
+import hashlib
+import inspect
+
+# Respuesta fija de los backends falsos, en lugar de la salida de un modelo real
+RESPUESTA_POR_DEFECTO = [
+    {
+        "head": "terremoto",
+        "head_type": "Desastre natural",
+        "relation": "ocurrió en",
+        "tail": "Nueva Zelanda",
+        "tail_type": "Lugar"
+    }
+]
+
+# Líneas "[id] texto" con las que compilador_prompt.compile_pack presenta cada documento de un paquete
+PATRON_PAQUETE = re.compile(r'^\[([^\]\s]+)\] ', re.MULTILINE)
+
+def respuesta_falsa(respuesta, contenido):
+    """
+    Respuesta de los backends falsos a un mensaje: si el mensaje es un paquete
+    de documentos, un objeto JSON con la respuesta fija para cada
+    identificador, como haría un modelo que sigue el formato de paquete.
+    """
+    ids = PATRON_PAQUETE.findall(contenido)
+    if len(ids) < 2:
+        return respuesta
+    try:
+        tripletas = json.loads(respuesta)
+    except json.JSONDecodeError:
+        tripletas = []
+    return json.dumps({doc_id: tripletas for doc_id in ids}, ensure_ascii=False)
+
+class OllamaBackend:
+    """Backend sobre un servidor Ollama (local o remoto)"""
+
+    def __init__(self, host=None, timeout=None):
+        import ollama
+        self.client = ollama.Client(host=host, timeout=timeout)
+
+    def chat(self, model, messages, format=None, stream=False, **kwargs):
+        return self.client.chat(model=model, messages=messages, format=format, stream=stream, **kwargs)
+
+    def generate(self, model, prompt='', keep_alive=None):
+        return self.client.generate(model=model, prompt=prompt, keep_alive=keep_alive)
+
+class OpenAICompatibleBackend:
+    """
+    Backend para servidores locales con la API de OpenAI (llama.cpp, vLLM,
+    LM Studio...). Traduce las respuestas al formato de Ollama para que el
+    resto del código no dependa del servidor.
+    """
+
+    def __init__(self, host='http://localhost:8000/v1', api_key=None, timeout=None):
+        import requests
+        self.session = requests.Session()
+        self.base_url = (host or 'http://localhost:8000/v1').rstrip('/')
+        self.timeout = timeout
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+
+    def chat(self, model, messages, format=None, stream=False, **kwargs):
+        payload = {'model': model, 'messages': messages, 'stream': stream}
+        if isinstance(format, dict):
+            payload['response_format'] = {'type': 'json_schema', 'json_schema': {'name': 'salida', 'schema': format}}
+        elif format == 'json':
+            payload['response_format'] = {'type': 'json_object'}
+
+        response = self.session.post(f"{self.base_url}/chat/completions", json=payload, timeout=self.timeout, stream=stream)
+        response.raise_for_status()
+        if stream:
+            return self._stream(response)
+
+        data = response.json()
+        usage = data.get('usage') or {}
+        return {
+            'model': model,
+            'message': {'role': 'assistant', 'content': data['choices'][0]['message']['content']},
+            'done': True,
+            'prompt_eval_count': usage.get('prompt_tokens'),
+            'eval_count': usage.get('completion_tokens'),
+        }
+
+    def _stream(self, response):
+        # Eventos SSE "data: {...}"; cerrar el generador cierra la conexión y detiene la generación
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                delta = json.loads(data)['choices'][0].get('delta', {})
+                yield {'message': {'role': 'assistant', 'content': delta.get('content') or ''}, 'done': False}
+        yield {'message': {'role': 'assistant', 'content': ''}, 'done': True}
+
+    def generate(self, model, prompt='', keep_alive=None):
+        # Estos servidores cargan un modelo fijo al arrancar: no hay carga ni descarga bajo demanda
+        return {'model': model, 'response': '', 'done': True}
+
+class FakeBackend:
+    """
+    Backend determinista en proceso, para experimentos de rendimiento y
+    benchmarks de regresión sin servidor ni modelos descargados.
+
+    Cada petición espera latencia segundos (más latencia_por_token por cada
+    fragmento generado) y devuelve una de las respuestas fijas, elegida según
+    el hash del modelo y del último mensaje: la misma petición siempre recibe
+    la misma respuesta.
+    """
+
+    def __init__(self, respuestas=None, latencia=0.0, latencia_por_token=0.0):
+        respuestas = respuestas if respuestas is not None else [RESPUESTA_POR_DEFECTO]
+        self.respuestas = [r if isinstance(r, str) else json.dumps(r, ensure_ascii=False) for r in respuestas]
+        self.latencia = latencia
+        self.latencia_por_token = latencia_por_token
+
+    def _elegir(self, model, messages):
+        contenido = messages[-1]['content'] if messages else ''
+        huella = hashlib.sha256(f"{model}\x00{contenido}".encode('utf-8')).digest()
+        return respuesta_falsa(self.respuestas[int.from_bytes(huella[:4], 'big') % len(self.respuestas)], contenido)
+
+    def chat(self, model, messages, format=None, stream=False, **kwargs):
+        respuesta = self._elegir(model, messages)
+        fragmentos = [respuesta[i:i + 4] for i in range(0, len(respuesta), 4)] or ['']
+        prompt_tokens = sum(len(m['content'].split()) for m in messages)
+        time.sleep(self.latencia)
+        if stream:
+            return self._stream(model, fragmentos, prompt_tokens)
+
+        time.sleep(self.latencia_por_token * len(fragmentos))
+        return {
+            'model': model,
+            'message': {'role': 'assistant', 'content': respuesta},
+            'done': True,
+            'prompt_eval_count': prompt_tokens,
+            'eval_count': len(fragmentos),
+        }
+
+    def _stream(self, model, fragmentos, prompt_tokens):
+        for fragmento in fragmentos:
+            time.sleep(self.latencia_por_token)
+            yield {'model': model, 'message': {'role': 'assistant', 'content': fragmento}, 'done': False}
+        yield {'model': model, 'message': {'role': 'assistant', 'content': ''}, 'done': True,
+               'prompt_eval_count': prompt_tokens, 'eval_count': len(fragmentos)}
+
+    def generate(self, model, prompt='', keep_alive=None):
+        return {'model': model, 'response': '', 'done': True, 'load_duration': 0}
+
+BACKENDS = {
+    'ollama': OllamaBackend,
+    'openai': OpenAICompatibleBackend,
+    'fake': FakeBackend,
+}
+
+def crear_backend(nombre='ollama', **opciones):
+    """Crea el backend por nombre ('ollama', 'openai' o 'fake'), ignorando las opciones que no use"""
+    if nombre not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {nombre} (use {', '.join(BACKENDS)})")
+    clase = BACKENDS[nombre]
+    parametros = inspect.signature(clase).parameters
+    return clase(**{clave: valor for clave, valor in opciones.items() if clave in parametros and valor is not None})
@@ -0,0 +1,203 @@
+import ast
+import json
+import math
+from collections import namedtuple
+
+CLAVES = ('head', 'head_type', 'relation', 'tail', 'tail_type')
+
+# Registro tipado de una tripleta
+Tripleta = namedtuple('Tripleta', CLAVES)
+
+# Motivos de los diagnósticos de parseo
+JSON_INVALIDO = 'json_invalido'
+CLAVES_INCOMPLETAS = 'claves_incompletas'
+LITERAL_PYTHON = 'literal_python'
+TRUNCADO = 'truncado'
+
+class ParserIncremental:
+    """
+    Parser incremental y tolerante de la salida del modelo.
+
+    Recibe el texto por fragmentos y lo recorre una sola vez. Recupera cada
+    objeto {...} completo en cuanto se cierra, esté donde esté (dentro de un
+    array, de un objeto envoltorio o suelto entre texto), y lo valida como
+    tripleta con las cinco claves. Los objetos con comillas simples se leen
+    como literales de Python y los valores numéricos se pasan a texto.
+
+    Con parar_al_cerrar, done se marca al cerrarse el primer array de primer
+    nivel, para poder cortar la generación en ese momento; sin él se recorre
+    todo el texto (varias listas, texto alrededor...).
+    """
+
+    def __init__(self, parar_al_cerrar=True):
+        self.parar_al_cerrar = parar_al_cerrar
+        self.tripletas = []
+        self.diagnostico = {JSON_INVALIDO: 0, CLAVES_INCOMPLETAS: 0, LITERAL_PYTHON: 0, TRUNCADO: 0}
+        self.done = False
+        self._arrays = 0
+        self._started = False
+        self._comilla = None
+        self._escape = False
+        self._buffer = []
+        self._pila = []  # Por cada objeto abierto: [posición en el buffer, si contiene tripletas]
+
+    @property
+    def invalidas(self):
+        return self.diagnostico[JSON_INVALIDO] + self.diagnostico[CLAVES_INCOMPLETAS]
+
+    def feed(self, fragmento):
+        """Procesa un fragmento de texto; devuelve True cuando el array está completo"""
+        for ch in fragmento:
+            if self.done:
+                break
+
+            if not self._pila:
+                # Fuera de los objetos solo importan los corchetes del array y el inicio de un objeto
+                if ch == '{':
+                    self._pila.append([0, False])
+                    self._buffer = [ch]
+                elif ch == '[':
+                    self._arrays += 1
+                    self._started = True
+                elif ch == ']' and self._arrays:
+                    self._arrays -= 1
+                    if self._arrays == 0 and self.parar_al_cerrar:
+                        self.done = True
+                continue
+
+            self._buffer.append(ch)
+            if self._comilla:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == self._comilla:
+                    self._comilla = None
+                continue
+
+            if ch in '"\'':
+                self._comilla = ch
+            elif ch == '{':
+                self._pila.append([len(self._buffer) - 1, False])
+            elif ch == '}':
+                inicio, con_tripletas = self._pila.pop()
+                es_tripleta = self._cerrar_objeto(''.join(self._buffer[inicio:]), con_tripletas, anidado=bool(self._pila))
+                if self._pila and (es_tripleta or con_tripletas):
+                    self._pila[-1][1] = True
+                if not self._pila:
+                    self._buffer = []
+        return self.done
+
+    def finalizar(self):
+        """Marca como truncado un objeto o un array que quedó sin cerrar al terminar el texto"""
+        if self._pila or self._arrays:
+            self.diagnostico[TRUNCADO] += 1
+            self._pila = []
+            self._buffer = []
+            self._arrays = 0
+
+    def _leer(self, texto):
+        try:
+            return json.loads(texto)
+        except json.JSONDecodeError:
+            pass
+        try:
+            objeto = ast.literal_eval(texto)
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            return None
+        self.diagnostico[LITERAL_PYTHON] += 1
+        return objeto
+
+    def _cerrar_objeto(self, texto, con_tripletas, anidado):
+        objeto = self._leer(texto)
+        tripleta = a_tripleta(objeto) if isinstance(objeto, dict) else None
+        if tripleta is not None:
+            self.tripletas.append(tripleta)
+            return True
+        # Los objetos que envuelven tripletas y los valores anidados no cuentan como errores
+        if not con_tripletas and not anidado:
+            self.diagnostico[JSON_INVALIDO if objeto is None else CLAVES_INCOMPLETAS] += 1
+        return False
+
+    def to_json(self):
+        """Array JSON con las tripletas válidas recuperadas"""
+        return json.dumps([tripleta._asdict() for tripleta in self.tripletas], ensure_ascii=False)
+
+def a_tripleta(objeto):
+    """Tripleta tipada si el diccionario tiene las cinco claves con texto (o números), None si no"""
+    valores = []
+    for clave in CLAVES:
+        valor = objeto.get(clave)
+        if isinstance(valor, str):
+            valores.append(valor)
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            valores.append(str(valor))
+        else:
+            return None
+    return Tripleta(*valores)
+
+def _quitar_vallas(texto):
+    """Texto sin los espacios de los extremos ni la valla de código (```json ... ```) que lo rodea"""
+    texto = texto.strip()
+    if texto.startswith('```'):
+        texto = texto[texto.find('\n') + 1:] if '\n' in texto else ''
+        texto = texto.rstrip()
+        if texto.endswith('```'):
+            texto = texto[:-3].rstrip()
+    return texto
+
+def _lista_de_tripletas(objeto):
+    """Tripletas de una lista en la que todos los elementos son tripletas válidas, None si no lo es"""
+    if not isinstance(objeto, list):
+        return None
+    tripletas = []
+    for elemento in objeto:
+        tripleta = a_tripleta(elemento) if isinstance(elemento, dict) else None
+        if tripleta is None:
+            return None
+        tripletas.append(tripleta)
+    return tripletas
+
+def parsear_tripletas(salida):
+    """
+    Parsea de una vez una salida completa del modelo (o una columna ya
+    limpia). Devuelve (tripletas, diagnostico); los valores vacíos o NaN
+    dan una lista vacía.
+
+    La salida que ya es un array JSON de tripletas válidas (lo habitual tras
+    Cleansing.py o con la salida estructurada) se lee con json.loads; el
+    recorrido carácter a carácter solo se usa cuando esa lectura falla.
+    """
+    parser = ParserIncremental(parar_al_cerrar=False)
+    if salida is None or (isinstance(salida, float) and math.isnan(salida)):
+        return parser.tripletas, parser.diagnostico
+    if isinstance(salida, list):
+        tripletas = _lista_de_tripletas(salida)
+        if tripletas is not None:
+            return tripletas, parser.diagnostico
+    if not isinstance(salida, str):
+        salida = json.dumps(salida, ensure_ascii=False) if isinstance(salida, (list, dict)) else str(salida)
+    else:
+        texto = _quitar_vallas(salida)
+        if texto.startswith('['):
+            try:
+                tripletas = _lista_de_tripletas(json.loads(texto))
+            except json.JSONDecodeError:
+                tripletas = None
+            if tripletas is not None:
+                return tripletas, parser.diagnostico
+    parser.feed(salida)
+    parser.finalizar()
+    return parser.tripletas, parser.diagnostico
+
+def resumen_diagnosticos(diagnosticos):
+    """Totales de una secuencia de diagnósticos por fila"""
+    totales = {JSON_INVALIDO: 0, CLAVES_INCOMPLETAS: 0, LITERAL_PYTHON: 0, TRUNCADO: 0}
+    filas_con_problemas = 0
+    for diagnostico in diagnosticos:
+        for motivo, cantidad in diagnostico.items():
+            totales[motivo] += cantidad
+        filas_con_problemas += any(diagnostico[motivo] for motivo in (JSON_INVALIDO, CLAVES_INCOMPLETAS, TRUNCADO))
+    return (f"Parseo de tripletas: {filas_con_problemas} filas con problemas; {totales[JSON_INVALIDO]} objetos con JSON inválido, "
+            f"{totales[CLAVES_INCOMPLETAS]} sin las cinco claves, {totales[TRUNCADO]} truncados, "
+            f"{totales[LITERAL_PYTHON]} leídos como literal de Python")
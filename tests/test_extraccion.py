@@ -0,0 +1,103 @@
+import os
+import csv
+import sys
+import subprocess
+
+import pandas as pd
+
+CARPETA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '2. Extraction of Named Entities and Relations')
+
+def ejecutar_ner(tmp_path, filas, *opciones, env=None):
+    """Ejecuta NER_SLM.py con el backend fake sobre un CSV con las filas dadas y devuelve la cabecera y las filas escritas"""
+    entrada = tmp_path / 'entrada.csv'
+    salida = tmp_path / 'salida.csv'
+    pd.DataFrame(filas).to_csv(entrada, index=False, encoding='latin9')
+    subprocess.run([sys.executable, 'NER_SLM.py', '--backend', 'fake', '--sin-cache', '--entrada', str(entrada), '--salida', str(salida), *opciones],
+                   cwd=CARPETA, check=True, capture_output=True, env=env)
+    with open(salida, encoding='utf-8', newline='') as f:
+        lineas = list(csv.reader(f))
+    return lineas[0], lineas[1:]
+
+def comprobar_alineacion(cabecera, filas):
+    assert len(set(cabecera)) == len(cabecera)
+    for fila in filas:
+        assert len(fila) == len(cabecera)
+        valores = dict(zip(cabecera, fila))
+        for columna in ('tokens_prompt', 'tokens_completion'):
+            if valores.get(columna):
+                float(valores[columna])
+
+def test_duplicados_en_varios_chunks(tmp_path):
+    # El segundo chunk (filas 3 y 4) solo tiene duplicados del representante 1
+    filas = {
+        'id': [1, 2, 3, 4, 5, 6],
+        'texto_completo': ['Un terremoto sacudió Wellington', 'Inundaciones en el norte', 'Un terremoto sacudió Wellington.',
+                           'Un terremoto sacudió Wellington!', 'Incendio en Auckland', 'Tormenta en la costa'],
+        'representante_id': [1, 2, 1, 1, 5, 6],
+        'tamano_grupo': [3, 1, 3, 3, 1, 1],
+    }
+    cabecera, escritas = ejecutar_ner(tmp_path, filas, '--duplicados', '--chunksize', '2')
+    comprobar_alineacion(cabecera, escritas)
+    assert len(escritas) == 6
+    por_id = {fila[cabecera.index('id')]: dict(zip(cabecera, fila)) for fila in escritas}
+    for duplicado in ('3', '4'):
+        assert por_id[duplicado]['tripletas_de'] == '1'
+        assert por_id[duplicado]['TripletasLlama'] == por_id['1']['TripletasLlama']
+        assert float(por_id[duplicado]['tokens_prompt']) == 0
+
+def test_duplicados_sin_columna_id(tmp_path):
+    # Sin columna id, deduplicacion.py usa el índice de la fila como id
+    filas = {
+        'texto_completo': ['Un terremoto sacudió Wellington', 'Inundaciones en el norte', 'Un terremoto sacudió Wellington.',
+                           'Un terremoto sacudió Wellington!'],
+        'representante_id': [0, 1, 0, 0],
+        'tamano_grupo': [3, 1, 3, 3],
+    }
+    cabecera, escritas = ejecutar_ner(tmp_path, filas, '--duplicados', '--chunksize', '2')
+    comprobar_alineacion(cabecera, escritas)
+    filas_escritas = [dict(zip(cabecera, fila)) for fila in escritas]
+    assert [fila['tripletas_de'] for fila in filas_escritas] == ['0', '1', '0', '0']
+    assert filas_escritas[2]['TripletasLlama'] == filas_escritas[0]['TripletasLlama']
+
+def test_duplicados_con_otra_columna_id(tmp_path):
+    filas = {
+        'doc': ['a', 'b', 'c'],
+        'texto_completo': ['Un terremoto sacudió Wellington', 'Un terremoto sacudió Wellington.', 'Incendio en Auckland'],
+        'representante_id': ['a', 'a', 'c'],
+        'tamano_grupo': [2, 2, 1],
+    }
+    cabecera, escritas = ejecutar_ner(tmp_path, filas, '--duplicados', '--columna-id', 'doc', '--chunksize', '2')
+    comprobar_alineacion(cabecera, escritas)
+    assert [dict(zip(cabecera, fila))['tripletas_de'] for fila in escritas] == ['a', 'a', 'c']
+
+def test_cascada_con_chunks_solo_de_lugares(tmp_path):
+    # El primer y el tercer chunk solo mencionan lugares: el gazetteer los resuelve sin llamar al modelo
+    gazetteer = tmp_path / 'lugares.csv'
+    pd.DataFrame({'location_type': ['city', 'city', 'region'], 'location_text': ['Wellington', 'Auckland', 'Canterbury']}).to_csv(gazetteer, index=False)
+    filas = {
+        'id': [1, 2, 3, 4, 5, 6],
+        'texto_completo': ['Wellington', 'Auckland, Wellington', 'Un terremoto sacudió Wellington', 'Incendio en Canterbury',
+                           'Canterbury', 'Auckland'],
+    }
+    cabecera, escritas = ejecutar_ner(tmp_path, filas, '--cascada', 'modelo-a', 'modelo-b', '--gazetteer', str(gazetteer),
+                                      '--omitir-solo-lugares', '--chunksize', '2')
+    comprobar_alineacion(cabecera, escritas)
+    assert {'TripletasLlama', 'modelo_cascada', 'tokens_prompt', 'tokens_completion'} <= set(cabecera)
+    por_id = {fila[cabecera.index('id')]: dict(zip(cabecera, fila)) for fila in escritas}
+    assert len(por_id) == 6
+    for solo_lugares in ('1', '2', '5', '6'):
+        assert por_id[solo_lugares]['TripletasLlama'] == '[]'
+        assert por_id[solo_lugares]['modelo_cascada'] == ''
+    for con_modelo in ('3', '4'):
+        assert por_id[con_modelo]['modelo_cascada'] in ('modelo-a', 'modelo-b')
+
+def test_backend_fake_sin_ollama(tmp_path):
+    # Un módulo ollama que falla al importarse, como si el paquete no estuviera instalado
+    sin_ollama = tmp_path / 'sin_ollama'
+    sin_ollama.mkdir()
+    (sin_ollama / 'ollama.py').write_text("raise ImportError('ollama no está instalado')\n")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(sin_ollama), os.environ.get('PYTHONPATH')])))
+    cabecera, escritas = ejecutar_ner(tmp_path, {'id': [1, 2], 'texto_completo': ['Un terremoto sacudió Wellington', 'Incendio en Auckland']},
+                                      env=env)
+    comprobar_alineacion(cabecera, escritas)
+    assert len(escritas) == 2
@@ -0,0 +1,40 @@
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '3. Post-processing'))
+
+from lectura_json import iterar_json_array
+
+DATOS = [
+    0.25, 12345, -7, 1e-05, 3.5e+20, 0, True, None,
+    {'texto': 'Un terremoto sacudió Wellington', 'magnitud': 7.8, 'profundidad': [12, 0.5, -3.25]},
+    [[1, 2.5], {'a': [0.1, {'b': 100000}]}, []],
+    'cadena con "comillas", comas] y corchetes [',
+    {}, False, 42,
+]
+
+@pytest.mark.parametrize('tamano_bloque', [1, 2, 3, 7])
+@pytest.mark.parametrize('separadores', [(',', ':'), (', ', ': ')])
+def test_igual_que_json_load(tmp_path, tamano_bloque, separadores):
+    ruta = tmp_path / 'datos.json'
+    ruta.write_text(json.dumps(DATOS, separators=separadores, ensure_ascii=False), encoding='utf-8')
+    with open(ruta, encoding='utf-8') as f:
+        esperado = json.load(f)
+    assert list(iterar_json_array(ruta, tamano_bloque=tamano_bloque)) == esperado
+
+@pytest.mark.parametrize('contenido', ['[0.1]', '[12345, 0.5]', ' \n [1e5,-2]\n', '[]'])
+@pytest.mark.parametrize('tamano_bloque', [1, 2, 3, 7])
+def test_numeros_cortados_por_el_bloque(tmp_path, contenido, tamano_bloque):
+    ruta = tmp_path / 'datos.json'
+    ruta.write_text(contenido, encoding='utf-8')
+    assert list(iterar_json_array(ruta, tamano_bloque=tamano_bloque)) == json.loads(contenido)
+
+def test_numero_en_el_limite_del_bloque_por_defecto(tmp_path):
+    # El bloque de 1 MiB termina justo después de '0.'
+    contenido = json.dumps(['x' * 1048572, 0.25])
+    ruta = tmp_path / 'datos.json'
+    ruta.write_text(contenido, encoding='utf-8')
+    assert list(iterar_json_array(ruta)) == json.loads(contenido)